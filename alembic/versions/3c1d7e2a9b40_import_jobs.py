@@ -0,0 +1,47 @@
+"""add import jobs and widen order totals
+
+Revision ID: 3c1d7e2a9b40
+Revises: 9ef4f0f3bba5
+Create Date: 2026-10-19 10:12:31.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1d7e2a9b40'
+down_revision = '9ef4f0f3bba5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('import_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('source', sa.String(length=1024), nullable=False),
+    sa.Column('format', sa.String(length=16), nullable=False),
+    sa.Column('status', sa.Enum('pending', 'running', 'completed', 'failed', name='import_status'), nullable=False),
+    sa.Column('rows_processed', sa.Integer(), nullable=False),
+    sa.Column('orders_created', sa.Integer(), nullable=False),
+    sa.Column('items_created', sa.Integer(), nullable=False),
+    sa.Column('errors_count', sa.Integer(), nullable=False),
+    sa.Column('errors', sa.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    # DECIMAL(2) could not hold order totals of 100 or more
+    op.alter_column('orders', 'total_amount',
+               existing_type=sa.DECIMAL(precision=2),
+               type_=sa.DECIMAL(precision=10, scale=2),
+               existing_nullable=True)
+
+
+def downgrade() -> None:
+    op.alter_column('orders', 'total_amount',
+               existing_type=sa.DECIMAL(precision=10, scale=2),
+               type_=sa.DECIMAL(precision=2),
+               existing_nullable=True)
+    op.drop_table('import_jobs')
+    sa.Enum(name='import_status').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,24 @@
+"""unique index on product sku
+
+Revision ID: b52e0f4d1c87
+Revises: 3c1d7e2a9b40
+Create Date: 2026-10-19 11:47:05.218930
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b52e0f4d1c87'
+down_revision = '3c1d7e2a9b40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Fails if duplicate SKUs exist; deduplicate the products table before upgrading
+    op.create_index(op.f('ix_products_sku'), 'products', ['sku'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_products_sku'), table_name='products')
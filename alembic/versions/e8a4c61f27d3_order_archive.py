@@ -0,0 +1,56 @@
+"""order archive tables
+
+Revision ID: e8a4c61f27d3
+Revises: b52e0f4d1c87
+Create Date: 2026-10-19 14:05:48.731556
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8a4c61f27d3'
+down_revision = 'b52e0f4d1c87'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('orders_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('total_amount', sa.DECIMAL(precision=10, scale=2), nullable=True),
+    sa.Column('status', postgresql.ENUM('pending', 'confirmed', 'delivered', name='status', create_type=False),
+              nullable=False),
+    sa.Column('customer_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('order_items_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=True),
+    sa.Column('product_id', sa.Integer(), nullable=True),
+    sa.Column('quantity', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['order_id'], ['orders_archive.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_order_items_archive_order_id'), 'order_items_archive', ['order_id'], unique=False)
+    op.create_table('archived_sales_daily',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('category_id', sa.Integer(), nullable=True),
+    sa.Column('total_quantity', sa.Integer(), nullable=False),
+    sa.Column('total_sales', sa.DECIMAL(precision=14, scale=2), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'product_id')
+    )
+    op.create_index(op.f('ix_orders_created_at'), 'orders', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_orders_created_at'), table_name='orders')
+    op.drop_table('archived_sales_daily')
+    op.drop_index(op.f('ix_order_items_archive_order_id'), table_name='order_items_archive')
+    op.drop_table('order_items_archive')
+    op.drop_table('orders_archive')
@@ -0,0 +1,46 @@
+"""
+Bytes on the wire and compression CPU cost per reporting route.
+
+Usage: python -m app.benchmarks.compression [--repeat N]
+Runs against the database configured by DATABASE_URL.
+"""
+import argparse
+import time
+
+from fastapi.testclient import TestClient
+
+from app.core.compression import available_encodings, compress_body
+from app.ecommerce.v1 import API_PREFIX
+from app.main import app
+
+ROUTES = ("/overview", "/inventory-details", "/sales-details", "/products")
+
+
+def measure(body: bytes, encoding: str, repeat: int) -> tuple:
+    """
+    Return the compressed size and the mean CPU milliseconds to compress the body.
+    """
+    started = time.process_time()
+    for _ in range(repeat):
+        compressed = compress_body(encoding, body)
+    elapsed = (time.process_time() - started) / repeat
+    return len(compressed), elapsed * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    client = TestClient(app)
+    print(f"{'route':<22}{'encoding':<10}{'bytes':>12}{'ratio':>8}{'cpu ms':>10}")
+    for route in ROUTES:
+        body = client.get(API_PREFIX + route, headers={"Accept-Encoding": "identity"}).content
+        print(f"{route:<22}{'identity':<10}{len(body):>12}{1:>8.2f}{0:>10.3f}")
+        for encoding in available_encodings():
+            size, cpu_ms = measure(body, encoding, args.repeat)
+            print(f"{route:<22}{encoding:<10}{size:>12}{size / max(len(body), 1):>8.2f}{cpu_ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import math
+import time
+from collections import OrderedDict
+from typing import FrozenSet, Iterable, Optional
+
+from fastapi import HTTPException
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+MAX_TRACKED_CLIENTS = 10000
+
+
+class InMemoryRateLimitBackend:
+    """
+    Token buckets held in this worker's memory, one per client key.
+
+    A shared backend (e.g. Redis) can replace it by providing the same take() method.
+    The least recently seen clients are evicted once max_clients is reached.
+    """
+
+    def __init__(self, rate: float, burst: int, max_clients: int = MAX_TRACKED_CLIENTS):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+
+    def take(self, key: str) -> float:
+        """
+        Consume one token for the key. Return 0 when allowed, otherwise the seconds until a token is free.
+        """
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = [float(self.burst), now]
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0
+        return (1 - bucket[0]) / self.rate if self.rate else math.inf
+
+
+class AdmissionControlMiddleware:
+    """
+    Rejects work up front instead of letting it queue for a database connection.
+
+    Every request spends a token from its client's bucket and gets a 429 when empty. A client is identified
+    by its X-API-Key only when the key is one of api_keys; anything else is keyed on the client IP, so
+    made-up keys can neither mint fresh buckets nor evict other clients' buckets.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        rate: float,
+        burst: int,
+        api_keys: Iterable[str] = (),
+        backend: Optional[InMemoryRateLimitBackend] = None,
+    ):
+        self.app = app
+        self.api_keys = frozenset(api_keys)
+        self.backend = backend or InMemoryRateLimitBackend(rate, burst)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        retry_after = self.backend.take(client_key(scope, self.api_keys))
+        if retry_after:
+            response = reject(429, "Too many requests", retry_after)
+            await response(scope, receive, send)
+            return
+
+        await self.app(scope, receive, send)
+
+
+class ConcurrencyBudget:
+    """
+    Caps how many computations of one kind run at once; entering it past the limit raises a 503.
+
+    Wrap the work itself rather than the request, e.g. inside a single-flight leader, so callers
+    that wait on an existing computation do not spend the budget.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+
+    def __enter__(self) -> "ConcurrencyBudget":
+        if self.active >= self.limit:
+            raise HTTPException(status_code=503, detail="Server busy, retry shortly", headers={"Retry-After": "1"})
+        self.active += 1
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.active -= 1
+
+
+def client_key(scope: Scope, api_keys: FrozenSet[str] = frozenset()) -> str:
+    api_key = Headers(scope=scope).get("x-api-key")
+    if api_key and api_key in api_keys:
+        return f"key:{api_key}"
+    client = scope.get("client")
+    return f"ip:{client[0]}" if client else "ip:unknown"
+
+
+def reject(status_code: int, detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        {"detail": detail},
+        status_code=status_code,
+        headers={"Retry-After": str(max(1, math.ceil(min(retry_after, 3600))))},
+    )
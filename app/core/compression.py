@@ -0,0 +1,198 @@
+import zlib
+from typing import Callable, Dict, Optional
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+# Levels tuned for dynamic API responses rather than for maximum ratio
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+ZSTD_LEVEL = 3
+
+# Content types that must reach the client as soon as they are written
+UNBUFFERED_CONTENT_TYPES = ("text/event-stream",)
+
+
+class Compressor:
+    """
+    Incremental compressor: feed chunks with compress(), end the stream with finish().
+    """
+
+    def __init__(self, compress: Callable[[bytes], bytes], finish: Callable[[], bytes]):
+        self.compress = compress
+        self.finish = finish
+
+
+def gzip_compressor() -> Compressor:
+    stream = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    return Compressor(stream.compress, stream.flush)
+
+
+def brotli_compressor() -> Compressor:
+    stream = brotli.Compressor(quality=BROTLI_QUALITY)
+    return Compressor(stream.process, stream.finish)
+
+
+def zstd_compressor() -> Compressor:
+    stream = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    return Compressor(stream.compress, stream.flush)
+
+
+def available_encodings() -> Dict[str, Callable[[], Compressor]]:
+    """
+    Supported encodings in server preference order.
+    """
+    encodings = {}
+    if zstandard is not None:
+        encodings["zstd"] = zstd_compressor
+    if brotli is not None:
+        encodings["br"] = brotli_compressor
+    encodings["gzip"] = gzip_compressor
+    return encodings
+
+
+def negotiate_encoding(accept_encoding: str, encodings: Dict[str, Callable[[], Compressor]]) -> Optional[str]:
+    """
+    Pick the encoding with the highest q-value from an Accept-Encoding header.
+    Ties are broken by server preference.
+    """
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            weights[name.strip()] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in encodings:
+        quality = weights.get(encoding, weights.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class CompressionMiddleware:
+    """
+    Negotiated gzip/brotli/zstd compression for responses of at least minimum_size bytes.
+
+    Streaming responses are compressed chunk by chunk, so the full body is never buffered.
+    Chunks of offload_size bytes or more are compressed in a worker thread to keep the event loop free.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, offload_size: int = 64 * 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.offload_size = offload_size
+        self.encodings = available_encodings()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            headers = Headers(scope=scope)
+            encoding = negotiate_encoding(headers.get("Accept-Encoding", ""), self.encodings)
+            if encoding:
+                responder = CompressionResponder(
+                    self.app, encoding, self.encodings[encoding](), self.minimum_size, self.offload_size
+                )
+                await responder(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+class CompressionResponder:
+    def __init__(self, app: ASGIApp, encoding: str, compressor: Compressor, minimum_size: int, offload_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.compressor = compressor
+        self.minimum_size = minimum_size
+        self.offload_size = offload_size
+        self.send: Optional[Send] = None
+        self.initial_message: Message = {}
+        self.started = False
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message) -> None:
+        message_type = message["type"]
+
+        if message_type == "http.response.start":
+            # Hold the headers back until the first body chunk tells us whether to compress
+            self.initial_message = message
+            headers = Headers(raw=message["headers"])
+            self.passthrough = "content-encoding" in headers or headers.get("content-type", "").startswith(
+                UNBUFFERED_CONTENT_TYPES
+            )
+            return
+
+        if message_type != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if not self.started:
+            self.started = True
+            if self.passthrough or (not more_body and len(body) < self.minimum_size):
+                self.passthrough = True
+                await self.send(self.initial_message)
+                await self.send(message)
+                return
+
+            headers = MutableHeaders(raw=self.initial_message["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            body = await self.compress(body, finish=not more_body)
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                headers["Content-Length"] = str(len(body))
+
+            await self.send(self.initial_message)
+            await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+            return
+
+        if self.passthrough:
+            await self.send(message)
+            return
+
+        body = await self.compress(body, finish=not more_body)
+        await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+    async def compress(self, body: bytes, finish: bool) -> bytes:
+        if len(body) >= self.offload_size:
+            return await anyio.to_thread.run_sync(self._compress, body, finish)
+        return self._compress(body, finish)
+
+    def _compress(self, body: bytes, finish: bool) -> bytes:
+        data = self.compressor.compress(body)
+        if finish:
+            data += self.compressor.finish()
+        return data
+
+
+def compress_body(encoding: str, body: bytes) -> bytes:
+    """
+    Compress a complete body in one go, as the middleware would for a non-streaming response.
+    """
+    compressor = available_encodings()[encoding]()
+    return compressor.compress(body) + compressor.finish()
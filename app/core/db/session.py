@@ -7,8 +7,11 @@ from sqlalchemy.orm import sessionmaker
 
 load_dotenv(".env")
 
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE") or 5)
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW") or 10)
+
 Base = declarative_base()
-engine = create_engine(os.environ["DATABASE_URL"])
+engine = create_engine(os.environ["DATABASE_URL"], pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
@@ -18,3 +21,11 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def get_session_factory():
+    """
+    For work that may outlive the request, such as computations shared between requests,
+    which must open and close its own sessions.
+    """
+    return SessionLocal
@@ -0,0 +1,108 @@
+import asyncio
+import itertools
+import json
+from collections import deque
+from typing import AsyncIterator, Deque, Optional, Set, Tuple
+
+from fastapi.encoders import jsonable_encoder
+
+HEARTBEAT_SECONDS = 15
+RECONNECT_MILLISECONDS = 3000
+SUBSCRIBER_QUEUE_SIZE = 100
+REPLAY_BUFFER_SIZE = 1000
+
+
+def format_event(event_id: int, event: str, data: dict) -> str:
+    """
+    Serialize an event into the text/event-stream wire format.
+    """
+    payload = json.dumps(jsonable_encoder(data), separators=(",", ":"))
+    return f"id: {event_id}\nevent: {event}\ndata: {payload}\n\n"
+
+
+class Subscription:
+    """
+    A connected client. Its queue is bounded so one slow reader cannot grow memory without limit.
+    """
+
+    def __init__(self, queue_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.lagging = False
+
+
+class EventBroker:
+    """
+    In-process fan-out of server-sent events to every connected client.
+
+    Publishing never blocks: a client whose queue is full is disconnected and resumes
+    from the replay buffer when its EventSource reconnects with Last-Event-ID.
+    """
+
+    def __init__(
+        self,
+        queue_size: int = SUBSCRIBER_QUEUE_SIZE,
+        replay_size: int = REPLAY_BUFFER_SIZE,
+        heartbeat: float = HEARTBEAT_SECONDS,
+    ):
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+        self._ids = itertools.count(1)
+        self._history: Deque[Tuple[int, str]] = deque(maxlen=replay_size)
+        self._subscribers: Set[Subscription] = set()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, event: str, data: dict) -> int:
+        """
+        Send an event to all subscribers and keep it for replay. Must be called from the event loop thread.
+        """
+        event_id = next(self._ids)
+        message = format_event(event_id, event, data)
+        self._history.append((event_id, message))
+
+        for subscription in list(self._subscribers):
+            try:
+                subscription.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                subscription.lagging = True
+                self._subscribers.discard(subscription)
+
+        return event_id
+
+    def replay(self, last_event_id: Optional[str]) -> list:
+        """
+        Return the buffered events newer than the given Last-Event-ID.
+        """
+        try:
+            last_seen = int(last_event_id)
+        except (TypeError, ValueError):
+            return []
+        return [message for event_id, message in self._history if event_id > last_seen]
+
+    async def stream(self, last_event_id: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Yield events for one client until it disconnects or falls too far behind.
+        """
+        subscription = Subscription(self.queue_size)
+        self._subscribers.add(subscription)
+        missed = self.replay(last_event_id)
+
+        try:
+            yield f"retry: {RECONNECT_MILLISECONDS}\n\n"
+            for message in missed:
+                yield message
+
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscription.queue.get(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+
+                if subscription.lagging:
+                    break
+                yield message
+        finally:
+            self._subscribers.discard(subscription)
@@ -0,0 +1,282 @@
+import asyncio
+import cProfile
+import io
+import itertools
+import marshal
+import math
+import os
+import pstats
+import secrets
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from functools import partial
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, Response
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+PROFILE_HEADER = "x-profile"
+MAX_STORED_PROFILES = 50
+MAX_CAPTURE_SECONDS = 60
+MAX_PROFILE_SECONDS = 30
+UNPROFILED_CONTENT_TYPES = ("text/event-stream",)
+
+# Innermost frames of threads that are blocked waiting: lock and queue waits, thread joins, the event loop
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+}
+SAMPLE_INTERVAL_SECONDS = 0.005
+
+
+def require_admin(x_admin_token: str = Header(None)):
+    """
+    Allow the request only when X-Admin-Token matches the ADMIN_TOKEN environment variable.
+    """
+    expected = os.environ.get("ADMIN_TOKEN")
+    if not expected or not x_admin_token or not secrets.compare_digest(x_admin_token, expected):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+def is_admin(scope: Scope) -> bool:
+    expected = os.environ.get("ADMIN_TOKEN")
+    token = Headers(scope=scope).get("x-admin-token")
+    return bool(expected and token and secrets.compare_digest(token, expected))
+
+
+class ProfileStore:
+    """
+    Keeps the most recent request profiles, keyed by a sequential id.
+    """
+
+    def __init__(self, max_profiles: int = MAX_STORED_PROFILES):
+        self.max_profiles = max_profiles
+        self._ids = itertools.count(1)
+        self._profiles: "OrderedDict[int, dict]" = OrderedDict()
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    def add(self, profile_id: int, summary: dict, stats: dict, stacks: str = "") -> None:
+        self._profiles[profile_id] = {"summary": summary, "stats": stats, "stacks": stacks}
+        while len(self._profiles) > self.max_profiles:
+            self._profiles.popitem(last=False)
+
+    def get(self, profile_id: int) -> Optional[dict]:
+        return self._profiles.get(profile_id)
+
+    def summaries(self) -> list:
+        return [profile["summary"] for profile in reversed(self._profiles.values())]
+
+
+profile_store = ProfileStore()
+
+
+class ProfilingMiddleware:
+    """
+    Runs selected requests under cProfile and stores the result in profile_store.
+
+    A request is profiled when an admin sends the X-Profile header, or as every sample_rate-th request
+    when sample_rate is set. Only one request is profiled at a time because cProfile is per thread
+    and concurrent requests share the event loop thread; the profile also includes whatever other
+    coroutines ran meanwhile. cProfile only sees the event loop thread, so the stacks of every thread,
+    including the threadpool running sync routes and run_in_threadpool work, are sampled alongside it.
+    Profiling ends with the response body, when an event stream starts, or after MAX_PROFILE_SECONDS,
+    whichever comes first, so long-lived responses do not keep the profiler running.
+    Only install this middleware when profiling is enabled.
+    """
+
+    def __init__(self, app: ASGIApp, sample_rate: int = 0, store: ProfileStore = profile_store):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.store = store
+        self._requests = itertools.count(1)
+        self._busy = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or self._busy:
+            await self.app(scope, receive, send)
+            return
+
+        requested = PROFILE_HEADER in Headers(scope=scope) and is_admin(scope)
+        sampled = bool(self.sample_rate) and next(self._requests) % self.sample_rate == 0
+        if not (requested or sampled):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = self.store.next_id()
+        profiler = cProfile.Profile()
+        sampler = StackSampler()
+        started = time.perf_counter()
+        timeout: Optional[asyncio.TimerHandle] = None
+
+        def finish(reason: str) -> None:
+            nonlocal profiler
+            if profiler is None:
+                return
+            profiler.disable()
+            stacks = sampler.stop()
+            timeout.cancel()
+            self._busy = False
+            profiler.create_stats()
+            summary = {
+                "id": profile_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+                "sampled": not requested,
+                "ended": reason,
+            }
+            self.store.add(profile_id, summary, profiler.stats, stacks)
+            profiler = None
+
+        async def send_with_profile_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["X-Profile-Id"] = str(profile_id)
+                # An event stream stays open indefinitely; profile only the handler that started it
+                if Headers(raw=message["headers"]).get("content-type", "").startswith(UNPROFILED_CONTENT_TYPES):
+                    finish("stream")
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish("response")
+
+        self._busy = True
+        sampler.start()
+        profiler.enable()
+        timeout = asyncio.get_running_loop().call_later(MAX_PROFILE_SECONDS, finish, "timeout")
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            finish("response")
+
+
+def format_stats(stats: dict, limit: int = 50) -> str:
+    """
+    Render a cProfile stats dict as a pstats report sorted by cumulative time.
+    """
+    output = io.StringIO()
+    report = pstats.Stats(stream=output)
+    report.stats = stats
+    report.get_top_level_stats()
+    report.sort_stats("cumulative").print_stats(limit)
+    return output.getvalue()
+
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def is_idle(frame) -> bool:
+    """
+    Whether a thread's innermost frame is a blocking wait rather than work.
+    """
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES
+
+
+def sample_stacks(
+    seconds: float = math.inf,
+    interval: float = SAMPLE_INTERVAL_SECONDS,
+    stop: Optional[threading.Event] = None,
+    include_idle: bool = False,
+) -> str:
+    """
+    Sample every thread's stack for the given duration, or until stop is set,
+    and return flamegraph-compatible collapsed stacks.
+
+    Sampling is by wall-clock time, so threads blocked waiting (idle pool workers, the event loop in
+    select) would dominate the output; their samples are dropped unless include_idle is set.
+    """
+    sampler_thread = threading.get_ident()
+    stop = stop or threading.Event()
+    stacks = Counter()
+    deadline = time.monotonic() + seconds
+
+    while time.monotonic() < deadline:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == sampler_thread:
+                continue
+            if not include_idle and is_idle(frame):
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(frame_label(frame))
+                frame = frame.f_back
+            stacks[";".join(reversed(labels))] += 1
+        if stop.wait(interval):
+            break
+
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+class StackSampler:
+    """
+    Runs sample_stacks in a background thread between start() and stop().
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL_SECONDS):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._stacks = ""
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self) -> None:
+        self._stacks = sample_stacks(interval=self.interval, stop=self._stop)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> str:
+        self._stop.set()
+        self._thread.join()
+        return self._stacks
+
+
+profiling_router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+
+@profiling_router.get("/profile", response_class=PlainTextResponse)
+async def capture_worker_profile(
+    seconds: float = Query(10, gt=0, le=MAX_CAPTURE_SECONDS),
+    include_idle: bool = Query(False, description="Keep samples of threads blocked waiting"),
+):
+    """
+    Sample this worker for the given number of seconds and return collapsed stacks of the threads
+    that were busy. This is a wall-clock profile: busy includes time spent in blocking I/O.
+    """
+    return await run_in_threadpool(partial(sample_stacks, seconds, include_idle=include_idle))
+
+
+@profiling_router.get("/profiles")
+async def get_request_profiles():
+    """
+    List the stored request profiles, newest first.
+    """
+    return profile_store.summaries()
+
+
+@profiling_router.get("/profiles/{profile_id}")
+async def get_request_profile(profile_id: int, format: str = Query("text", regex="^(text|pstats|collapsed)$")):
+    """
+    Return a stored request profile as a text report, a binary pstats file,
+    or the collapsed stacks sampled from all threads.
+    """
+    profile = profile_store.get(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    if format == "pstats":
+        return Response(
+            marshal.dumps(profile["stats"]),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.pstats"'},
+        )
+    if format == "collapsed":
+        return PlainTextResponse(profile["stacks"])
+    return PlainTextResponse(format_stats(profile["stats"]))
@@ -0,0 +1,55 @@
+import asyncio
+import time
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls that share a key into one computation whose result every caller receives.
+
+    With a ttl, a finished result is also reused by callers arriving within ttl seconds.
+    Failures are never cached. Writers call forget() so cached results never outlive a change made by
+    this process; changes made elsewhere (other workers, CLI jobs) can stay hidden for up to ttl seconds.
+    """
+
+    def __init__(self, ttl: float = 0):
+        self.ttl = ttl
+        self._generation = 0
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self._results: Dict[Hashable, Tuple[float, Any]] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]) -> Any:
+        if self.ttl:
+            cached = self._results.get(key)
+            if cached is not None and cached[0] > time.monotonic():
+                return cached[1]
+
+        call = self._calls.get(key)
+        if call is None:
+            call = asyncio.ensure_future(fn())
+            self._calls[key] = call
+            call.add_done_callback(partial(self._finish, key, self._generation))
+
+        # A cancelled caller must not cancel the computation the other callers are waiting on
+        return await asyncio.shield(call)
+
+    def forget(self) -> None:
+        """
+        Drop cached results after a write that invalidates them.
+        Computations already in flight still answer their callers but are not cached.
+        """
+        self._generation += 1
+        self._results.clear()
+
+    def _finish(self, key: Hashable, generation: int, call: asyncio.Future) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+        if call.cancelled() or call.exception() is not None or not self.ttl or generation != self._generation:
+            return
+
+        now = time.monotonic()
+        for stale_key in [k for k, (expires, _) in self._results.items() if expires <= now]:
+            del self._results[stale_key]
+        self._results[key] = (now + self.ttl, call.result())
@@ -0,0 +1,51 @@
+import json
+from typing import Any, Dict, Iterator, Sequence
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+
+# Items encoded per body chunk; each chunk is produced in a threadpool hop
+JSON_BATCH_SIZE = 500
+
+
+def encode_json(value: Any) -> bytes:
+    """
+    Encode a value the way FastAPI's JSONResponse does.
+    """
+    return json.dumps(
+        jsonable_encoder(value), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def iter_json_array(items: Sequence, batch_size: int = JSON_BATCH_SIZE) -> Iterator[bytes]:
+    """
+    Yield a JSON array in chunks of batch_size encoded items.
+    """
+    yield b"["
+    for start in range(0, len(items), batch_size):
+        chunk = b",".join(encode_json(item) for item in items[start:start + batch_size])
+        yield b"," + chunk if start else chunk
+    yield b"]"
+
+
+def iter_json_object(fields: Dict[str, Any], batch_size: int = JSON_BATCH_SIZE) -> Iterator[bytes]:
+    """
+    Yield a JSON object whose list values are streamed with iter_json_array.
+    """
+    yield b"{"
+    for position, (name, value) in enumerate(fields.items()):
+        yield (b"," if position else b"") + encode_json(name) + b":"
+        if isinstance(value, list):
+            yield from iter_json_array(value, batch_size)
+        else:
+            yield encode_json(value)
+    yield b"}"
+
+
+def stream_json(value: Any) -> StreamingResponse:
+    """
+    Send a large list, or an object of lists, as a chunked JSON body, so neither the encoded body
+    nor its compressed form is ever held in memory as a whole.
+    """
+    chunks = iter_json_object(value) if isinstance(value, dict) else iter_json_array(value)
+    return StreamingResponse(chunks, media_type="application/json")
@@ -0,0 +1,162 @@
+"""
+Moves orders older than a horizon, with their items, out of the hot tables into archive tables.
+
+Orders are archived in batches of the oldest ids, each in its own transaction, so an interrupted run
+loses nothing and the next run simply continues. Every batch also folds its sales into
+archived_sales_daily, which the reporting endpoints read instead of the archived rows.
+
+Usage: python -m app.ecommerce.v1.archiver [--horizon-days 365] [--batch-size 1000]
+"""
+import argparse
+import os
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Dict, Optional
+
+from loguru import logger
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.core.db.session import SessionLocal
+from app.ecommerce.v1.models import ArchivedOrder, ArchivedOrderItem, ArchivedSalesDaily, Order, OrderItem, Product
+
+ARCHIVE_HORIZON_DAYS = int(os.environ.get("ARCHIVE_HORIZON_DAYS") or 365)
+ARCHIVE_BATCH_SIZE = 1000
+
+ORDER_COLUMNS = ("id", "total_amount", "status", "customer_id", "created_at")
+ORDER_ITEM_COLUMNS = ("id", "order_id", "product_id", "quantity")
+
+
+def add_daily_sales(db: Session, order_ids: list) -> None:
+    """
+    Fold the sales of the given orders into archived_sales_daily.
+    """
+    rows = db.execute(
+        select(Order.created_at, OrderItem.product_id, Product.category_id, OrderItem.quantity, Product.price)
+        .join(OrderItem.orders)
+        .join(OrderItem.products)
+        .where(OrderItem.order_id.in_(order_ids))
+    )
+    totals: Dict[tuple, list] = defaultdict(lambda: [None, 0, 0])
+    for created_at, product_id, category_id, quantity, price in rows:
+        total = totals[(created_at.date(), product_id)]
+        total[0] = category_id
+        total[1] += quantity or 0
+        total[2] += (price or 0) * (quantity or 0)
+
+    if not totals:
+        return
+
+    existing = {
+        (row.day, row.product_id): row
+        for row in db.query(ArchivedSalesDaily).filter(
+            ArchivedSalesDaily.day.in_({day for day, _ in totals}),
+            ArchivedSalesDaily.product_id.in_({product_id for _, product_id in totals}),
+        )
+    }
+    for (day, product_id), (category_id, quantity, sales) in totals.items():
+        row = existing.get((day, product_id))
+        if row is None:
+            db.add(ArchivedSalesDaily(
+                day=day, product_id=product_id, category_id=category_id, total_quantity=quantity, total_sales=sales
+            ))
+        else:
+            row.category_id = category_id
+            row.total_quantity += quantity
+            row.total_sales += sales
+    db.flush()
+
+
+def archive_batch(db: Session, cutoff: datetime, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """
+    Move up to batch_size of the oldest orders created before cutoff into the archive. Returns the count moved.
+    """
+    order_ids = db.execute(
+        select(Order.id).where(Order.created_at < cutoff).order_by(Order.id).limit(batch_size)
+    ).scalars().all()
+    if not order_ids:
+        return 0
+
+    add_daily_sales(db, order_ids)
+
+    orders, items = Order.__table__, OrderItem.__table__
+    db.execute(insert(ArchivedOrder.__table__).from_select(
+        ORDER_COLUMNS, select(*(orders.c[column] for column in ORDER_COLUMNS)).where(orders.c.id.in_(order_ids))
+    ))
+    db.execute(insert(ArchivedOrderItem.__table__).from_select(
+        ORDER_ITEM_COLUMNS,
+        select(*(items.c[column] for column in ORDER_ITEM_COLUMNS)).where(items.c.order_id.in_(order_ids)),
+    ))
+    db.execute(delete(items).where(items.c.order_id.in_(order_ids)))
+    db.execute(delete(orders).where(orders.c.id.in_(order_ids)))
+    return len(order_ids)
+
+
+def archive_orders(
+    horizon_days: int = ARCHIVE_HORIZON_DAYS,
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+    session_factory: Callable[[], Session] = SessionLocal,
+) -> int:
+    """
+    Archive every order older than horizon_days, committing after each batch. Returns the count moved.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=horizon_days)
+    archived = 0
+    while True:
+        with session_factory() as db:
+            moved = archive_batch(db, cutoff, batch_size)
+            db.commit()
+        archived += moved
+        if moved:
+            logger.info(f"Archived {archived} orders created before {cutoff:%Y-%m-%d}.")
+        if moved < batch_size:
+            break
+
+    logger.success(f"Archived {archived} orders.")
+    return archived
+
+
+def latest_archived_day(db: Session) -> Optional[date]:
+    return db.query(func.max(ArchivedSalesDaily.day)).scalar()
+
+
+def archived_sales(
+    db: Session, start_date: date, end_date: date, product_id: int, category_id: int
+) -> Dict[int, tuple]:
+    """
+    Return {product_id: (total quantity, total sales)} from the archive for a sales-details query,
+    without touching the archive when the requested range starts after the newest archived day.
+    """
+    if start_date and end_date:
+        latest_day = latest_archived_day(db)
+        if latest_day is None or start_date > latest_day:
+            return {}
+
+    query = db.query(
+        ArchivedSalesDaily.product_id,
+        func.sum(ArchivedSalesDaily.total_quantity),
+        func.sum(ArchivedSalesDaily.total_sales),
+    ).filter(ArchivedSalesDaily.category_id.isnot(None))
+
+    if start_date and end_date:
+        query = query.filter(ArchivedSalesDaily.day.between(start_date, end_date))
+
+    if product_id:
+        query = query.filter(ArchivedSalesDaily.product_id == product_id)
+
+    if category_id:
+        query = query.filter(ArchivedSalesDaily.category_id == category_id)
+
+    return {row[0]: (row[1], row[2]) for row in query.group_by(ArchivedSalesDaily.product_id)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Move old orders into the archive tables.")
+    parser.add_argument("--horizon-days", type=int, default=ARCHIVE_HORIZON_DAYS)
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    args = parser.parse_args()
+    archive_orders(args.horizon_days, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""
+Compact in-process index of the product catalog for hot lookups by id, SKU and category.
+
+Products are stored column-wise in typed arrays sorted by id, SKUs as UTF-8 bytes in one buffer, and the
+SKU lookup is an open-addressing table of product ids, so each product costs a few dozen bytes instead
+of a full ORM instance. The index is loaded once at startup and kept current by session hooks that re-read
+the products touched by each committed transaction.
+
+Only this process's ORM sessions keep the index current, so it is only correct when this process is the
+sole writer of products. Updates and deletes made by other workers or through Core statements leave
+stale hits behind: a deleted product still exists, a moved SKU still maps to its old id. The index is
+therefore opt-in with CATALOG_INDEX_ENABLED, for single-process deployments. A miss always falls back to
+the database, orders are always priced from the database, and SKU uniqueness is enforced by its index.
+"""
+import os
+import threading
+from array import array
+from bisect import bisect_left, insort
+from decimal import Decimal
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from sqlalchemy import event, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session, SessionTransaction
+
+from app.core.db.session import SessionLocal
+from app.ecommerce.v1.models import Product
+
+CATALOG_INDEX_ENABLED = bool(os.environ.get("CATALOG_INDEX_ENABLED"))
+LOAD_BATCH_SIZE = 5000
+EMPTY, DELETED = 0, -1
+NO_CATEGORY = 0
+
+
+class CatalogEntry(NamedTuple):
+    id: int
+    sku: Optional[str]
+    price: Decimal
+    category_id: Optional[int]
+
+
+def to_cents(price) -> int:
+    return int((Decimal(price or 0) * 100).to_integral_value())
+
+
+class CatalogIndex:
+    def __init__(self):
+        self.loaded = False
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._ids = array("q")
+        self._prices = array("q")
+        self._categories = array("q")
+        self._sku_offsets = array("q")
+        self._sku_lengths = array("l")
+        self._sku_data = bytearray()
+        self._sku_garbage = 0
+        self._slots = array("q", [EMPTY]) * 8
+        self._slots_used = 0
+        self._by_category: Dict[int, array] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def load(self, db: Session) -> None:
+        """
+        Rebuild the index from the products table in a single streamed query.
+        """
+        rows = db.execute(
+            select(Product.id, Product.sku, Product.price, Product.category_id)
+            .order_by(Product.id)
+            .execution_options(yield_per=LOAD_BATCH_SIZE)
+        )
+        with self._lock:
+            self._reset()
+            for product_id, sku, price, category_id in rows:
+                self._ids.append(product_id)
+                self._prices.append(to_cents(price))
+                self._categories.append(category_id or NO_CATEGORY)
+                self._append_sku(sku)
+                if category_id:
+                    self._by_category.setdefault(category_id, array("q")).append(product_id)
+            self._rehash(len(self._ids))
+            self.loaded = True
+
+    def unload(self) -> None:
+        with self._lock:
+            self.loaded = False
+            self._reset()
+
+    def get(self, product_id: int) -> Optional[CatalogEntry]:
+        with self._lock:
+            position = self._position(product_id)
+            if position is None:
+                return None
+            category_id = self._categories[position]
+            return CatalogEntry(
+                product_id,
+                self._sku_at(position),
+                Decimal(self._prices[position]) / 100,
+                category_id if category_id != NO_CATEGORY else None,
+            )
+
+    def contains(self, product_id: int) -> bool:
+        with self._lock:
+            return self._position(product_id) is not None
+
+    def id_for_sku(self, sku: str) -> Optional[int]:
+        with self._lock:
+            slot = self._find_slot(sku)
+            return self._slots[slot] if self._slots[slot] > 0 else None
+
+    def ids_in_category(self, category_id: int) -> Tuple[int, ...]:
+        with self._lock:
+            return tuple(self._by_category.get(category_id, ()))
+
+    def upsert(self, product_id: int, sku: Optional[str], price, category_id: Optional[int]) -> None:
+        with self._lock:
+            self.remove(product_id)
+            position = bisect_left(self._ids, product_id)
+            self._ids.insert(position, product_id)
+            self._prices.insert(position, to_cents(price))
+            self._categories.insert(position, category_id or NO_CATEGORY)
+            self._sku_offsets.insert(position, len(self._sku_data))
+            encoded = sku.encode() if sku is not None else b""
+            self._sku_lengths.insert(position, len(encoded) if sku is not None else -1)
+            self._sku_data += encoded
+            if category_id:
+                insort(self._by_category.setdefault(category_id, array("q")), product_id)
+            if sku is not None:
+                self._insert_slot(sku, product_id)
+
+    def remove(self, product_id: int) -> None:
+        with self._lock:
+            position = self._position(product_id)
+            if position is None:
+                return
+
+            sku = self._sku_at(position)
+            if sku is not None:
+                self._slots[self._find_slot(sku)] = DELETED
+                self._sku_garbage += self._sku_lengths[position]
+
+            category_id = self._categories[position]
+            if category_id != NO_CATEGORY:
+                members = self._by_category[category_id]
+                members.pop(bisect_left(members, product_id))
+                if not members:
+                    del self._by_category[category_id]
+
+            for column in (self._ids, self._prices, self._categories, self._sku_offsets, self._sku_lengths):
+                column.pop(position)
+
+            if self._sku_garbage > len(self._sku_data) // 2:
+                self._compact_skus()
+
+    def memory_usage(self) -> int:
+        """
+        Approximate bytes held by the index buffers.
+        """
+        columns = (self._ids, self._prices, self._categories, self._sku_offsets, self._sku_lengths, self._slots)
+        total = sum(column.itemsize * column.buffer_info()[1] for column in columns) + len(self._sku_data)
+        return total + sum(members.itemsize * len(members) for members in self._by_category.values())
+
+    def _position(self, product_id: int) -> Optional[int]:
+        position = bisect_left(self._ids, product_id)
+        if position < len(self._ids) and self._ids[position] == product_id:
+            return position
+        return None
+
+    def _sku_at(self, position: int) -> Optional[str]:
+        length = self._sku_lengths[position]
+        if length < 0:
+            return None
+        offset = self._sku_offsets[position]
+        return self._sku_data[offset:offset + length].decode()
+
+    def _append_sku(self, sku: Optional[str]) -> None:
+        encoded = sku.encode() if sku is not None else b""
+        self._sku_offsets.append(len(self._sku_data))
+        self._sku_lengths.append(len(encoded) if sku is not None else -1)
+        self._sku_data += encoded
+
+    def _compact_skus(self) -> None:
+        skus = [self._sku_at(position) for position in range(len(self._ids))]
+        self._sku_offsets, self._sku_lengths, self._sku_data = array("q"), array("l"), bytearray()
+        self._sku_garbage = 0
+        for sku in skus:
+            self._append_sku(sku)
+
+    def _find_slot(self, sku: str) -> int:
+        """
+        Return the slot holding the SKU, or the empty slot where it would go.
+        """
+        mask = len(self._slots) - 1
+        slot = hash(sku) & mask
+        while True:
+            product_id = self._slots[slot]
+            if product_id == EMPTY:
+                return slot
+            if product_id > 0 and self._sku_at(self._position(product_id)) == sku:
+                return slot
+            slot = (slot + 1) & mask
+
+    def _insert_slot(self, sku: str, product_id: int) -> None:
+        if (self._slots_used + 1) * 2 > len(self._slots):
+            self._rehash(len(self._ids))
+        slot = self._find_slot(sku)
+        if self._slots[slot] == EMPTY:
+            self._slots_used += 1
+        self._slots[slot] = product_id
+
+    def _rehash(self, count: int) -> None:
+        capacity = 8
+        while capacity < count * 2 + 2:
+            capacity *= 2
+        self._slots = array("q", [EMPTY]) * capacity
+        self._slots_used = 0
+        for position, product_id in enumerate(self._ids):
+            sku = self._sku_at(position)
+            if sku is not None:
+                slot = self._find_slot(sku)
+                self._slots_used += self._slots[slot] == EMPTY
+                self._slots[slot] = product_id
+
+
+catalog = CatalogIndex()
+
+
+def load_catalog() -> None:
+    """
+    Load the index when CATALOG_INDEX_ENABLED is set; without it every lookup queries the database.
+    """
+    if not CATALOG_INDEX_ENABLED:
+        return
+    with SessionLocal() as db:
+        catalog.load(db)
+
+
+def product_exists(db: Session, product_id: int) -> bool:
+    if catalog.loaded and catalog.contains(product_id):
+        return True
+    return db.query(Product.id).filter(Product.id == product_id).first() is not None
+
+
+def product_id_for_sku(db: Session, sku: str) -> Optional[int]:
+    if catalog.loaded:
+        product_id = catalog.id_for_sku(sku)
+        if product_id is not None:
+            return product_id
+    return db.query(Product.id).filter(Product.sku == sku).scalar()
+
+
+@event.listens_for(Session, "after_flush")
+def track_product_changes(session: Session, flush_context) -> None:
+    touched = session.info.setdefault("catalog_changes", set())
+    for instance in session.new | session.dirty | session.deleted:
+        if isinstance(instance, Product):
+            touched.add(instance.id)
+
+
+@event.listens_for(Session, "after_commit")
+def apply_product_changes(session: Session) -> None:
+    touched = session.info.pop("catalog_changes", None)
+    if not touched or not catalog.loaded:
+        return
+
+    # The session cannot emit SQL here, so the committed rows are read on its bind directly
+    query = select(Product.id, Product.sku, Product.price, Product.category_id).where(Product.id.in_(touched))
+    bind = session.get_bind()
+    if isinstance(bind, Connection):
+        rows = bind.execute(query).all()
+    else:
+        with bind.connect() as connection:
+            rows = connection.execute(query).all()
+
+    for product_id, sku, price, category_id in rows:
+        catalog.upsert(product_id, sku, price, category_id)
+    for product_id in touched - {row[0] for row in rows}:
+        catalog.remove(product_id)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def discard_product_changes(session: Session, previous_transaction: SessionTransaction) -> None:
+    # A rolled back savepoint leaves the outer transaction's changes pending, and touched ids are re-read
+    # at commit anyway, so only the outermost rollback discards them
+    if previous_transaction.parent is None:
+        session.info.pop("catalog_changes", None)
@@ -0,0 +1,408 @@
+"""
+Bulk order ingestion for marketplace and back-office feeds.
+
+Each source row is one order line. Rows sharing an order_ref are one order and must be contiguous;
+rows without an order_ref are single-line orders. The source is processed in chunks, and each chunk
+is committed together with the job's progress, so a failed or interrupted job resumes after the
+last committed chunk.
+
+A job only runs after it has been claimed, which atomically moves it from pending or failed to running.
+A running job whose progress heartbeat (updated_at, bumped by every committed chunk) is older than
+IMPORT_STALE_SECONDS is presumed dead and can be taken over with force.
+
+Usage: python -m app.ecommerce.v1.importer orders.ndjson [--format csv] [--resume JOB_ID [--force]]
+"""
+import argparse
+import csv
+import json
+import os
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from loguru import logger
+from pydantic import ValidationError
+from sqlalchemy import and_, bindparam, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.core.db.session import SessionLocal
+from app.ecommerce.v1.models import Customer, ImportJob, Inventory, InventoryChangeHistory, Order, OrderItem, Product
+from app.ecommerce.v1.schema import OrderImportSchema
+
+CHUNK_SIZE = 5000
+MAX_STORED_ERRORS = 100
+IMPORT_FORMATS = ("ndjson", "csv")
+IMPORT_STALE_SECONDS = int(os.environ.get("IMPORT_STALE_SECONDS") or 600)
+
+Row = Tuple[int, Optional[dict], Optional[str]]
+
+
+def read_rows(lines: Iterable[str], file_format: str) -> Iterator[Row]:
+    """
+    Yield (row number, parsed row, parse error) for every data row of an NDJSON or CSV source.
+    """
+    if file_format == "csv":
+        for row_number, row in enumerate(csv.DictReader(lines), 1):
+            # Empty CSV cells mean "not provided", not empty strings
+            yield row_number, {key: value for key, value in row.items() if value not in ("", None)}, None
+        return
+
+    row_number = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield row_number, None, f"invalid JSON: {e}"
+            continue
+        if isinstance(row, dict):
+            yield row_number, row, None
+        else:
+            yield row_number, None, "expected a JSON object"
+
+
+def chunk_rows(rows: Iterable[Row], chunk_size: int = CHUNK_SIZE) -> Iterator[List[Row]]:
+    """
+    Group rows into chunks of about chunk_size, never splitting the rows of one order across chunks.
+    """
+    chunk: List[Row] = []
+    for row in rows:
+        order_ref = row[1].get("order_ref") if row[1] else None
+        if len(chunk) >= chunk_size:
+            last = chunk[-1][1]
+            if order_ref is None or not last or last.get("order_ref") != order_ref:
+                yield chunk
+                chunk = []
+        chunk.append(row)
+    if chunk:
+        yield chunk
+
+
+def resolve_customers(db: Session, lines: List[OrderImportSchema]) -> List[int]:
+    """
+    Return a customer id per line, matching existing customers by email or phone and creating the rest.
+    """
+    emails = {line.email for line in lines}
+    phones = {line.phone for line in lines}
+    by_email, by_phone = {}, {}
+    existing = db.execute(
+        select(Customer.id, Customer.email, Customer.phone).where(
+            or_(Customer.email.in_(emails), Customer.phone.in_(phones))
+        )
+    )
+    for customer_id, email, phone in existing:
+        by_email[email] = customer_id
+        by_phone[phone] = customer_id
+
+    to_insert = []
+    for line in lines:
+        if line.email in by_email or line.phone in by_phone:
+            continue
+        # Reserve the email and phone so later lines of the same customer reuse this row
+        by_email[line.email] = by_phone[line.phone] = None
+        to_insert.append({"name": line.name, "email": line.email, "phone": line.phone, "address": line.address})
+
+    if to_insert:
+        created = db.execute(
+            insert(Customer).returning(Customer.id, Customer.email, Customer.phone, sort_by_parameter_order=True),
+            to_insert,
+        )
+        for customer_id, email, phone in created:
+            by_email[email] = customer_id
+            by_phone[phone] = customer_id
+
+    return [by_email.get(line.email) or by_phone.get(line.phone) for line in lines]
+
+
+def products_by_sku(db: Session, skus: set) -> Dict[str, Tuple[int, Decimal]]:
+    """
+    Map each known SKU to its (product id, price). Read from the database rather than the catalog index,
+    whose hits may be stale, so orders are never priced or linked from outdated products.
+    """
+    rows = db.execute(select(Product.id, Product.sku, Product.price).where(Product.sku.in_(skus)))
+    return {sku: (product_id, price) for product_id, sku, price in rows}
+
+
+def copy_order_items(db: Session, items: List[dict]) -> None:
+    """
+    Insert order items with COPY on Postgres, falling back to a batched INSERT elsewhere.
+    """
+    dialect = db.get_bind().dialect
+    if dialect.name == "postgresql" and dialect.driver == "psycopg":
+        cursor = db.connection().connection.cursor()
+        try:
+            with cursor.copy("COPY order_items (order_id, product_id, quantity) FROM STDIN") as copy:
+                for item in items:
+                    copy.write_row((item["order_id"], item["product_id"], item["quantity"]))
+        finally:
+            cursor.close()
+    else:
+        db.execute(insert(OrderItem.__table__), items)
+
+
+def apply_inventory_changes(db: Session, quantities: dict) -> List[dict]:
+    """
+    Decrement inventory by the aggregated quantity per product and record one history row per product.
+    Returns the changes, with what is needed to publish them as inventory events.
+    """
+    if not quantities:
+        return []
+
+    inventory = Inventory.__table__
+    db.execute(
+        update(inventory)
+        .where(inventory.c.product_id == bindparam("b_product_id"))
+        .values(remaining_quantity=inventory.c.remaining_quantity - bindparam("b_quantity")),
+        [{"b_product_id": product_id, "b_quantity": quantity} for product_id, quantity in quantities.items()],
+    )
+
+    changed_at = datetime.now(timezone.utc)
+    changes = [
+        {
+            "product_id": product_id,
+            "product_name": product_name,
+            "quantity_change": -quantities[product_id],
+            "previous_quantity": quantity + quantities[product_id],
+            "new_quantity": quantity,
+            "threshold": threshold,
+            "change_timestamp": changed_at,
+        }
+        for product_id, product_name, quantity, threshold in db.execute(
+            select(Inventory.product_id, Product.name, Inventory.remaining_quantity, Inventory.threshold)
+            .join(Inventory.products)
+            .where(Inventory.product_id.in_(quantities))
+        )
+    ]
+    if changes:
+        db.execute(
+            insert(InventoryChangeHistory.__table__),
+            [
+                {key: change[key] for key in ("product_id", "quantity_change", "new_quantity", "change_timestamp")}
+                for change in changes
+            ],
+        )
+    return changes
+
+
+def reserve_stock(db: Session, orders: List[dict]) -> Tuple[List[dict], List[dict]]:
+    """
+    Split orders into those the current inventory can fulfil and errors for the rows of the others.
+    Orders are taken in source order, and the inventory rows stay locked until the chunk commits.
+    Products without an inventory record are not stock-controlled.
+    """
+    product_ids = {item["product_id"] for order in orders for item in order["items"]}
+    stock = dict(db.execute(
+        select(Inventory.product_id, Inventory.remaining_quantity)
+        .where(Inventory.product_id.in_(product_ids))
+        .with_for_update()
+    ).all())
+
+    accepted, errors = [], []
+    for order in orders:
+        needed = defaultdict(int)
+        for item in order["items"]:
+            needed[item["product_id"]] += item["quantity"]
+        short = {product_id for product_id, quantity in needed.items()
+                 if product_id in stock and (stock[product_id] or 0) < quantity}
+        if short:
+            # Every line of the order is rejected, since a partial order must not be created
+            for (row_number, sku), item in zip(order["rows"], order["items"]):
+                if item["product_id"] in short:
+                    reason = f"insufficient inventory for SKU {sku!r}"
+                else:
+                    reason = "another line of the order has insufficient inventory"
+                errors.append({"row": row_number, "error": f"quantity: {reason}"})
+            continue
+        for product_id, quantity in needed.items():
+            if product_id in stock:
+                stock[product_id] = (stock[product_id] or 0) - quantity
+        accepted.append(order)
+    return accepted, errors
+
+
+def import_chunk(db: Session, rows: List[Row]) -> Tuple[int, int, List[dict], List[dict]]:
+    """
+    Validate and import one chunk of rows.
+    Returns (orders created, items created, row errors, inventory changes).
+    """
+    errors = []
+    # Orders with any failing line are rejected whole, since a partial order must not be created
+    failed_orders = set()
+    valid: List[Tuple[int, OrderImportSchema]] = []
+    for row_number, row, error in rows:
+        if error:
+            errors.append({"row": row_number, "error": error})
+            continue
+        try:
+            valid.append((row_number, OrderImportSchema.parse_obj(row)))
+        except ValidationError as e:
+            errors.append({"row": row_number, "error": "; ".join(
+                f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()
+            )})
+            if row.get("order_ref") is not None:
+                failed_orders.add(str(row["order_ref"]))
+
+    skus = {line.sku for _, line in valid}
+    products = products_by_sku(db, skus)
+    known = []
+    for row_number, line in valid:
+        if line.sku in products:
+            known.append((row_number, line))
+        else:
+            errors.append({"row": row_number, "error": f"sku: unknown SKU {line.sku!r}"})
+            if line.order_ref is not None:
+                failed_orders.add(line.order_ref)
+
+    lines = []
+    for row_number, line in known:
+        if line.order_ref is not None and line.order_ref in failed_orders:
+            errors.append({"row": row_number, "error": "order_ref: another line of the order is invalid"})
+        else:
+            lines.append((row_number, line))
+
+    orders = OrderedDict()
+    for row_number, line in lines:
+        key = line.order_ref or f"row-{row_number}"
+        order = orders.get(key)
+        if order is None:
+            order = orders[key] = {"line": line, "total_amount": 0, "items": [], "rows": []}
+        product_id, price = products[line.sku]
+        order["total_amount"] += price * line.quantity
+        order["items"].append({"product_id": product_id, "quantity": line.quantity})
+        order["rows"].append((row_number, line.sku))
+
+    accepted, stock_errors = reserve_stock(db, list(orders.values()))
+    errors.extend(stock_errors)
+    if not accepted:
+        return 0, 0, errors, []
+
+    customer_ids = resolve_customers(db, [order["line"] for order in accepted])
+    order_ids = db.execute(
+        insert(Order).returning(Order.id, sort_by_parameter_order=True),
+        [
+            {
+                "customer_id": customer_id,
+                "status": order["line"].status,
+                "created_at": order["line"].created_at or datetime.now(timezone.utc),
+                "total_amount": order["total_amount"],
+            }
+            for order, customer_id in zip(accepted, customer_ids)
+        ],
+    ).scalars().all()
+
+    items = []
+    quantities = defaultdict(int)
+    for order_id, order in zip(order_ids, accepted):
+        for item in order["items"]:
+            items.append({"order_id": order_id, **item})
+            quantities[item["product_id"]] += item["quantity"]
+
+    copy_order_items(db, items)
+    inventory_changes = apply_inventory_changes(db, quantities)
+    return len(order_ids), len(items), errors, inventory_changes
+
+
+def run_import(
+    job_id: int,
+    chunk_size: int = CHUNK_SIZE,
+    session_factory: Callable[[], Session] = SessionLocal,
+    on_progress: Optional[Callable[[ImportJob, List[dict]], None]] = None,
+) -> None:
+    """
+    Run or resume a claimed import job until its source is exhausted, committing after every chunk.
+    on_progress receives the job and the chunk's inventory changes after each commit.
+    """
+    db = session_factory()
+    try:
+        job = db.get(ImportJob, job_id)
+        try:
+            with open(job.source, newline="", encoding="utf-8") as source:
+                rows = islice(read_rows(source, job.format), job.rows_processed, None)
+                for chunk in chunk_rows(rows, chunk_size):
+                    orders_created, items_created, errors, inventory_changes = import_chunk(db, chunk)
+                    job.rows_processed += len(chunk)
+                    job.orders_created += orders_created
+                    job.items_created += items_created
+                    if errors:
+                        job.errors_count += len(errors)
+                        job.errors = (job.errors or []) + errors[:max(0, MAX_STORED_ERRORS - len(job.errors or []))]
+                    db.commit()
+                    if on_progress:
+                        on_progress(job, inventory_changes)
+        except Exception as e:
+            db.rollback()
+            job.status = "failed"
+            job.errors = (job.errors or []) + [{"row": job.rows_processed + 1, "error": f"import aborted: {e}"}]
+            db.commit()
+            logger.exception(f"Import job {job_id} failed after {job.rows_processed} rows.")
+            return
+
+        job.status = "completed"
+        db.commit()
+        logger.success(f"Import job {job_id} completed: {job.orders_created} orders, {job.errors_count} errors.")
+    finally:
+        db.close()
+
+
+def create_job(db: Session, source: str, file_format: str) -> ImportJob:
+    job = ImportJob(source=source, format=file_format, status="pending",
+                    rows_processed=0, orders_created=0, items_created=0, errors_count=0, errors=[])
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def claim_job(db: Session, job_id: int, force: bool = False) -> bool:
+    """
+    Atomically mark a pending or failed job as running, so only one runner ever works on it.
+    With force, a running job without progress for IMPORT_STALE_SECONDS is taken over as well.
+    Returns whether the job was claimed.
+    """
+    claimable = ImportJob.status.in_(("pending", "failed"))
+    if force:
+        stale_before = datetime.now(timezone.utc) - timedelta(seconds=IMPORT_STALE_SECONDS)
+        claimable = or_(claimable, and_(ImportJob.status == "running", ImportJob.updated_at < stale_before))
+
+    claimed = db.execute(
+        update(ImportJob).where(ImportJob.id == job_id, claimable).values(status="running"),
+        execution_options={"synchronize_session": False},
+    ).rowcount == 1
+    db.commit()
+    return claimed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Import orders from an NDJSON or CSV file.")
+    parser.add_argument("source", nargs="?", help="path of the file to import")
+    parser.add_argument("--format", choices=IMPORT_FORMATS, help="defaults to the file extension")
+    parser.add_argument("--resume", type=int, metavar="JOB_ID", help="resume an interrupted import job")
+    parser.add_argument("--force", action="store_true", help="take over a running job that has stopped progressing")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    if args.resume:
+        job_id = args.resume
+    elif args.source:
+        file_format = args.format or ("csv" if args.source.endswith(".csv") else "ndjson")
+        with SessionLocal() as db:
+            job_id = create_job(db, os.path.abspath(args.source), file_format).id
+    else:
+        parser.error("a source file or --resume JOB_ID is required")
+
+    with SessionLocal() as db:
+        if not claim_job(db, job_id, force=args.force):
+            parser.error(f"import job {job_id} is not pending, failed or (with --force) stale")
+
+    def report(job: ImportJob, inventory_changes: List[dict]) -> None:
+        print(f"job {job.id}: {job.rows_processed} rows, {job.orders_created} orders, {job.errors_count} errors")
+
+    run_import(job_id, chunk_size=args.chunk_size, on_progress=report)
+
+
+if __name__ == "__main__":
+    main()
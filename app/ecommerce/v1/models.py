@@ -1,5 +1,5 @@
 
-from sqlalchemy import Column, DECIMAL, DateTime, Enum, ForeignKey, Integer, String, Text
+from sqlalchemy import Column, DECIMAL, Date, DateTime, Enum, ForeignKey, Integer, JSON, String, Text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -23,7 +23,7 @@ class Product(Base):
 
     id = Column(Integer, primary_key=True)
     name = Column(String(255), index=True)
-    sku = Column(String(255))
+    sku = Column(String(255), unique=True, index=True)
     description = Column(Text)
     price = Column(DECIMAL(10, 2), default=0)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -86,7 +86,7 @@ class Order(Base):
     __tablename__ = 'orders'
 
     id = Column(Integer, primary_key=True)
-    total_amount = Column(DECIMAL(precision=2), default=0)
+    total_amount = Column(DECIMAL(10, 2), default=0)
 
     STATUS_CHOICES = Enum('pending', 'confirmed', 'delivered', name='status')
     status = Column(STATUS_CHOICES, default='pending', nullable=False)
@@ -94,7 +94,7 @@ class Order(Base):
     customer_id = Column(Integer, ForeignKey('customers.id'))
     customers = relationship('Customer', back_populates='orders')
 
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
 
     order_items = relationship('OrderItem', back_populates='orders')
 
@@ -109,3 +109,74 @@ class OrderItem(Base):
 
     orders = relationship('Order', back_populates='order_items')
     products = relationship('Product', back_populates='order_items')
+
+
+class ArchivedOrder(Base):
+    """
+    Cold copy of an order moved out of the orders table by the archiver.
+    """
+    __tablename__ = 'orders_archive'
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    total_amount = Column(DECIMAL(10, 2), default=0)
+    status = Column(Order.STATUS_CHOICES, nullable=False)
+    customer_id = Column(Integer)
+    created_at = Column(DateTime(timezone=True))
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    order_items = relationship('ArchivedOrderItem', back_populates='orders')
+    # No foreign key, so archived rows survive the customer; read-only and possibly None
+    customers = relationship(
+        'Customer', primaryjoin='foreign(ArchivedOrder.customer_id) == Customer.id', viewonly=True
+    )
+
+
+class ArchivedOrderItem(Base):
+    __tablename__ = 'order_items_archive'
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    order_id = Column(Integer, ForeignKey('orders_archive.id'), index=True)
+    product_id = Column(Integer)
+    quantity = Column(Integer)
+
+    orders = relationship('ArchivedOrder', back_populates='order_items')
+    products = relationship(
+        'Product', primaryjoin='foreign(ArchivedOrderItem.product_id) == Product.id', viewonly=True
+    )
+
+
+class ArchivedSalesDaily(Base):
+    """
+    Daily sales per product for archived orders, priced when they were archived.
+    """
+    __tablename__ = 'archived_sales_daily'
+
+    day = Column(Date, primary_key=True)
+    product_id = Column(Integer, primary_key=True)
+    category_id = Column(Integer)
+    total_quantity = Column(Integer, nullable=False, default=0)
+    total_sales = Column(DECIMAL(14, 2), nullable=False, default=0)
+
+
+class ImportJob(Base):
+    __tablename__ = 'import_jobs'
+
+    id = Column(Integer, primary_key=True)
+    source = Column(String(1024), nullable=False)
+    format = Column(String(16), nullable=False)
+
+    STATUS_CHOICES = Enum('pending', 'running', 'completed', 'failed', name='import_status')
+    status = Column(STATUS_CHOICES, default='pending', nullable=False)
+
+    # Rows already committed; a resumed job skips this many rows of the source
+    rows_processed = Column(Integer, default=0, nullable=False)
+    orders_created = Column(Integer, default=0, nullable=False)
+    items_created = Column(Integer, default=0, nullable=False)
+    errors_count = Column(Integer, default=0, nullable=False)
+    errors = Column(JSON, default=list)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __str__(self):
+        return f"Import Job #{self.id} ({self.status})"
@@ -1,3 +1,6 @@
+from datetime import datetime
+from typing import Optional
+
 from pydantic import BaseModel, Field
 
 
@@ -21,3 +24,16 @@ class OrderSchema(BaseModel):
 
     product_id: int
     quantity: int
+
+
+class OrderImportSchema(BaseModel):
+    order_ref: Optional[str] = Field(None, max_length=255)
+    name: str = Field(..., min_length=1, max_length=255)
+    email: str = Field(..., min_length=1, max_length=255)
+    phone: str = Field(..., min_length=1, max_length=255)
+    address: Optional[str]
+
+    sku: str = Field(..., min_length=1, max_length=255)
+    quantity: int = Field(..., gt=0)
+    status: str = Field('pending', regex='^(pending|confirmed|delivered)$')
+    created_at: Optional[datetime]
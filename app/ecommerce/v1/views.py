@@ -1,59 +1,116 @@
+import os
 from datetime import datetime, date
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+import anyio
+from anyio import from_thread
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from loguru import logger
 from typing import List, Dict, Union
 from sqlalchemy.orm import joinedload, Session
 from sqlalchemy import func
-
-from app.core.db.session import get_db
-from app.ecommerce.v1.models import Category, Product, Order, OrderItem, Inventory, InventoryChangeHistory
+from sqlalchemy.exc import IntegrityError
+
+from app.core.admission import ConcurrencyBudget
+from app.core.db.session import DB_MAX_OVERFLOW, DB_POOL_SIZE, get_db, get_session_factory
+from app.core.events import EventBroker
+from app.core.singleflight import SingleFlight
+from app.core.streaming import stream_json
+from app.ecommerce.v1.archiver import archived_sales
+from app.ecommerce.v1.catalog import product_exists, product_id_for_sku
+from app.ecommerce.v1.importer import claim_job, create_job, run_import
+from app.ecommerce.v1.models import (
+    ArchivedOrder, ArchivedOrderItem, Category, Product, Order, OrderItem, Inventory, InventoryChangeHistory, ImportJob
+)
 from app.ecommerce.v1.schema import CategorySchema, ProductSchema
 
 router = APIRouter()
+inventory_events = EventBroker()
+reporting_flight = SingleFlight(ttl=float(os.environ.get("REPORT_CACHE_TTL") or 0))
+IMPORT_DIR = os.environ.get("IMPORT_DIR") or "imports"
+
+# Each report may hold at most a quarter of the DB connections, leaving the rest for CRUD routes
+REPORT_CONCURRENCY = max(1, (DB_POOL_SIZE + DB_MAX_OVERFLOW) // 4)
+report_budgets = {
+    report: ConcurrencyBudget(REPORT_CONCURRENCY) for report in ("overview", "sales-details", "inventory-details")
+}
+
+
+async def run_report(report: str, session_factory, fn, *args):
+    """
+    Run fn(db, *args) in the threadpool within the report's concurrency budget. The query gets its own
+    session, since a shared computation must not depend on the request that happened to start it.
+    """
+    with report_budgets[report]:
+        return await run_in_threadpool(run_in_session, session_factory, fn, *args)
+
+
+def run_in_session(session_factory, fn, *args):
+    with session_factory() as db:
+        return fn(db, *args)
 
 
 @router.get("/overview", status_code=200)
-async def get_overview_details(db: Session = Depends(get_db)):
+async def get_overview_details(
+    session_factory=Depends(get_session_factory),
+    include_archived: bool = Query(False, description="Also return orders moved to the archive"),
+):
     """
-    Get all orders from the database.
+    Get all orders from the database, optionally including archived orders, as a chunked JSON array.
     """
+    orders = await reporting_flight.do(("overview", include_archived), lambda: run_report(
+        "overview", session_factory, query_overview, include_archived
+    ))
+    return stream_json(orders)
+
 
+def query_overview(db: Session, include_archived: bool = False) -> list:
     orders = db.query(Order).options(
         joinedload(Order.customers),
         joinedload(Order.order_items).joinedload(OrderItem.products)
     ).all()
 
-    sales_data = []
-    for order in orders:
-        sales_data.append({
-            'order_id': order.id,
-            'total_amount': order.total_amount,
-            'status': order.status,
-            'customer': {
-                'id': order.customers.id,
-                'name': order.customers.name,
-                'email': order.customers.email,
-                'phone': order.customers.phone,
-                'address': order.customers.address,
-            },
-            'order_items': [
-                {
-                    'product_id': item.products.id,
-                    'product_name': item.products.name,
-                    'quantity': item.quantity,
-                }
-                for item in order.order_items
-            ],
-            'created_at': order.created_at,
-        })
-
-    return sales_data
+    if include_archived:
+        orders += db.query(ArchivedOrder).options(
+            joinedload(ArchivedOrder.customers),
+            joinedload(ArchivedOrder.order_items).joinedload(ArchivedOrderItem.products)
+        ).all()
+
+    return [serialize_order(order) for order in orders]
+
+
+def serialize_order(order: Union[Order, ArchivedOrder]) -> dict:
+    # Archived orders keep ids of customers and products that may have been deleted since
+    customer = order.customers
+    return {
+        'order_id': order.id,
+        'total_amount': order.total_amount,
+        'status': order.status,
+        'customer': {
+            'id': customer.id,
+            'name': customer.name,
+            'email': customer.email,
+            'phone': customer.phone,
+            'address': customer.address,
+        } if customer else None,
+        'order_items': [
+            {
+                'product_id': item.product_id,
+                'product_name': item.products.name if item.products else None,
+                'quantity': item.quantity,
+            }
+            for item in order.order_items
+        ],
+        'created_at': order.created_at,
+        'archived': isinstance(order, ArchivedOrder),
+    }
 
 
 @router.get("/sales-details", response_model=List[Dict[str, Union[int, float]]], status_code=200)
 async def get_sales_details(
-    db: Session = Depends(get_db),
+    session_factory=Depends(get_session_factory),
     start_date: date = Query(None, description="Start date of the date range"),
     end_date: date = Query(None, description="End date of the date range"),
     product_id: int = Query(None, description="Product ID to filter by product"),
@@ -61,7 +118,16 @@ async def get_sales_details(
 ):
     """
     Provide sales data by date range, product, and category.
+    Identical concurrent requests share a single query.
     """
+    # Keyed on the parsed parameters so equivalent query strings collapse together
+    key = ("sales-details", start_date, end_date, product_id, category_id)
+    return await reporting_flight.do(key, lambda: run_report(
+        "sales-details", session_factory, query_sales_details, start_date, end_date, product_id, category_id
+    ))
+
+
+def query_sales_details(db: Session, start_date: date, end_date: date, product_id: int, category_id: int) -> list:
     sales_query = db.query(
         OrderItem.product_id,
         func.sum(OrderItem.quantity).label("total_quantity"),
@@ -69,8 +135,8 @@ async def get_sales_details(
     ).join(OrderItem.products).join(Product.categories)
 
     if start_date and end_date:
-        sales_query = sales_query.filter(
-            func.date(OrderItem.orders.created_at).between(start_date, end_date)
+        sales_query = sales_query.join(OrderItem.orders).filter(
+            func.date(Order.created_at).between(start_date, end_date)
         )
 
     if product_id:
@@ -91,14 +157,29 @@ async def get_sales_details(
         for row in sales_data
     ]
 
+    # Archived orders only contribute when the requested range reaches back into the archive
+    archived = archived_sales(db, start_date, end_date, product_id, category_id)
+    for item in sales_data_dict:
+        quantity, sales = archived.pop(item["product_id"], (0, 0))
+        item["total_quantity"] += quantity
+        item["total_sales"] += sales
+    sales_data_dict.extend(
+        {"product_id": archived_product_id, "total_quantity": quantity, "total_sales": sales}
+        for archived_product_id, (quantity, sales) in archived.items()
+    )
+
     return sales_data_dict
 
 
 @router.get("/inventory-details", status_code=200)
-async def get_inventory_details(db: Session = Depends(get_db)):
+async def get_inventory_details(session_factory=Depends(get_session_factory)):
     """
-    Get all inventory details from the database and check for low stock items.
+    Get all inventory details from the database and check for low stock items. The body is chunked.
     """
+    return stream_json(await run_report("inventory-details", session_factory, query_inventory_details))
+
+
+def query_inventory_details(db: Session) -> dict:
     inventory = db.query(Inventory).options(joinedload(Inventory.products)).all()
     low_stock_threshold = 10  # general threshold to alert for all products
     low_stock_items = []
@@ -114,8 +195,9 @@ async def get_inventory_details(db: Session = Depends(get_db)):
                     "threshold": item.threshold
                 })
 
+    # Encoded while the session is open; the response is streamed after it closes
     return {
-        "inventory": inventory,
+        "inventory": jsonable_encoder(inventory),
         "low_stock_items": low_stock_items
     }
 
@@ -138,6 +220,7 @@ async def create_category(payload: CategorySchema, db: Session = Depends(get_db)
     db.add(db_category)
     db.commit()
     logger.success("Created a category.")
+    reporting_flight.forget()
     return db_category
 
 
@@ -155,6 +238,7 @@ async def update_category(category_id: int, payload: CategorySchema, db: Session
 
     db.commit()
     logger.success("Updated a category.")
+    reporting_flight.forget()
     return category
 
 
@@ -170,6 +254,7 @@ async def delete_category(category_id: int, db: Session = Depends(get_db)):
     db.delete(category)
     db.commit()
     logger.success("Deleted a category.")
+    reporting_flight.forget()
     return {"message": "Category deleted successfully"}
 
 
@@ -187,11 +272,15 @@ async def create_product(payload: ProductSchema, db: Session = Depends(get_db)):
     """
     Create a new product in the database.
     """
+    if product_id_for_sku(db, payload.sku) is not None:
+        raise HTTPException(status_code=409, detail="A product with this SKU already exists")
+
     if db.query(Category).filter(Category.id == payload.category_id).first():
         db_product = Product(**payload.dict())
         db.add(db_product)
-        db.commit()
+        commit_product(db)
         logger.success("Created a product.")
+        reporting_flight.forget()
         return db_product
     else:
         raise HTTPException(status_code=404, detail="Category not found")
@@ -206,14 +295,29 @@ async def update_product(product_id: int, payload: ProductSchema, db: Session =
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
+    if product_id_for_sku(db, payload.sku) not in (None, product_id):
+        raise HTTPException(status_code=409, detail="A product with this SKU already exists")
+
     for key, value in payload.dict().items():
         setattr(product, key, value)
 
-    db.commit()
+    commit_product(db)
     logger.success("Updated a product.")
+    reporting_flight.forget()
     return product
 
 
+def commit_product(db: Session) -> None:
+    """
+    Commit a product write, turning a unique SKU violation from a concurrent writer into a 409.
+    """
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="A product with this SKU already exists")
+
+
 @router.delete("/products/{product_id}", status_code=204)
 async def delete_product(product_id: int, db: Session = Depends(get_db)):
     """
@@ -226,6 +330,7 @@ async def delete_product(product_id: int, db: Session = Depends(get_db)):
     db.delete(product)
     db.commit()
     logger.success("Deleted a product.")
+    reporting_flight.forget()
     return {"message": "Product deleted successfully"}
 
 
@@ -234,9 +339,7 @@ async def update_inventory(product_id: int, quantity_change: int, db: Session =
     """
     Update inventory levels for a specific product and track the change.
     """
-    product = db.query(Product).filter(Product.id == product_id).first()
-
-    if not product:
+    if not product_exists(db, product_id):
         raise HTTPException(status_code=404, detail="Product not found")
 
     inventory = db.query(Inventory).filter(Inventory.product_id == product_id).first()
@@ -245,7 +348,8 @@ async def update_inventory(product_id: int, quantity_change: int, db: Session =
         raise HTTPException(status_code=404, detail="Inventory record not found")
 
     # Calculate new remaining quantity after the change
-    new_remaining_quantity = inventory.remaining_quantity + quantity_change
+    previous_quantity = inventory.remaining_quantity
+    new_remaining_quantity = previous_quantity + quantity_change
 
     if new_remaining_quantity < 0:
         raise HTTPException(status_code=400, detail="Inventory cannot go negative")
@@ -264,10 +368,56 @@ async def update_inventory(product_id: int, quantity_change: int, db: Session =
     db.add(change_history)
     db.commit()
     db.refresh(inventory)
+    reporting_flight.forget()
+
+    publish_inventory_change({
+        "product_id": product_id,
+        "product_name": db.query(Product.name).filter(Product.id == product_id).scalar(),
+        "quantity_change": quantity_change,
+        "previous_quantity": previous_quantity,
+        "new_quantity": new_remaining_quantity,
+        "threshold": inventory.threshold,
+        "change_timestamp": change_history.change_timestamp,
+    })
 
     return {"message": "Inventory updated successfully"}
 
 
+def publish_inventory_change(change: dict) -> None:
+    """
+    Publish an inventory change, plus a low_stock or restocked alert when it crosses the threshold.
+    """
+    inventory_events.publish("inventory_change", {
+        key: change[key] for key in ("product_id", "quantity_change", "new_quantity", "change_timestamp")
+    })
+
+    # Notify only when the stock level crosses the threshold, not on every change below it
+    threshold = change["threshold"]
+    if threshold is not None:
+        was_low = change["previous_quantity"] <= threshold
+        is_low = change["new_quantity"] <= threshold
+        if is_low != was_low:
+            inventory_events.publish("low_stock" if is_low else "restocked", {
+                "product_id": change["product_id"],
+                "product_name": change["product_name"],
+                "remaining_quantity": change["new_quantity"],
+                "threshold": threshold,
+            })
+
+
+@router.get("/inventory/events", status_code=200)
+async def stream_inventory_events(last_event_id: str = Header(None)):
+    """
+    Stream inventory changes and low stock alerts as server-sent events.
+    Reconnecting clients resume from the Last-Event-ID header.
+    """
+    return StreamingResponse(
+        inventory_events.stream(last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/inventory-change-history/{product_id}", status_code=200)
 async def get_inventory_change_history(product_id: int, db: Session = Depends(get_db)):
     """
@@ -281,3 +431,76 @@ async def get_inventory_change_history(product_id: int, db: Session = Depends(ge
     change_history = db.query(InventoryChangeHistory).filter(InventoryChangeHistory.product_id == product_id).all()
 
     return {"product_name": product.name, "change_history": change_history}
+
+
+@router.post("/orders/import", status_code=202)
+async def import_orders(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    format: str = Query("ndjson", regex="^(ndjson|csv)$", description="Format of the request body"),
+    db: Session = Depends(get_db),
+):
+    """
+    Import orders from an NDJSON or CSV request body as a background job.
+    The body is spooled to disk so the job can be resumed.
+    """
+    os.makedirs(IMPORT_DIR, exist_ok=True)
+    path = os.path.abspath(os.path.join(IMPORT_DIR, f"orders-{datetime.now():%Y%m%d%H%M%S%f}.{format}"))
+    # Disk writes run in worker threads so a large upload does not block the event loop
+    async with await anyio.open_file(path, "wb") as spool:
+        async for chunk in request.stream():
+            await spool.write(chunk)
+
+    job = create_job(db, path, format)
+    claim_job(db, job.id)
+    db.refresh(job)
+    background_tasks.add_task(run_import, job.id, on_progress=import_progress)
+    logger.success(f"Queued order import job {job.id}.")
+    return job
+
+
+@router.get("/orders/import/{job_id}", status_code=200)
+async def get_import_job(job_id: int, db: Session = Depends(get_db)):
+    """
+    Get the progress of an order import job.
+    """
+    job = db.query(ImportJob).filter(ImportJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job
+
+
+@router.post("/orders/import/{job_id}/resume", status_code=202)
+async def resume_import_job(
+    job_id: int,
+    background_tasks: BackgroundTasks,
+    force: bool = Query(False, description="Take over a running job that has stopped progressing"),
+    db: Session = Depends(get_db),
+):
+    """
+    Resume a failed or interrupted order import job from its last committed chunk.
+    """
+    job = db.query(ImportJob).filter(ImportJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    if not claim_job(db, job_id, force=force):
+        db.refresh(job)
+        raise HTTPException(status_code=409, detail=f"Import job is {job.status}")
+
+    db.refresh(job)
+    background_tasks.add_task(run_import, job.id, on_progress=import_progress)
+    return job
+
+
+def import_progress(job: ImportJob, inventory_changes: List[dict]) -> None:
+    """
+    Invalidate cached reports and publish the inventory changes of each committed import chunk.
+    Runs in the import's worker thread, so the work is handed to the event loop.
+    """
+    from_thread.run_sync(apply_import_progress, inventory_changes)
+
+
+def apply_import_progress(inventory_changes: List[dict]) -> None:
+    reporting_flight.forget()
+    for change in inventory_changes:
+        publish_inventory_change(change)
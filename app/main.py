@@ -4,20 +4,37 @@ from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi_sqlalchemy import DBSessionMiddleware
 
+from app.core.admission import AdmissionControlMiddleware
+from app.core.compression import CompressionMiddleware
 from app.core.db.seeder import seed_items
 from app.core.logger import init_logging
+from app.core.profiling import ProfilingMiddleware, profiling_router
 from app.ecommerce.v1 import ecommerce_router
+from app.ecommerce.v1.catalog import load_catalog
 
 load_dotenv(".env")
 
 app = FastAPI(title="E-Commerce Admin Dashboard APIs")
 app.add_middleware(DBSessionMiddleware, db_url=os.environ["DATABASE_URL"])
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+app.add_middleware(
+    AdmissionControlMiddleware,
+    rate=float(os.environ.get("RATE_LIMIT_PER_SECOND") or 50),
+    burst=int(os.environ.get("RATE_LIMIT_BURST") or 100),
+    api_keys=[key.strip() for key in (os.environ.get("API_KEYS") or "").split(",") if key.strip()],
+)
 app.include_router(ecommerce_router)
 
+# Nothing profiling-related is installed unless enabled, so it costs nothing when off
+if os.environ.get("PROFILING_ENABLED"):
+    app.add_middleware(ProfilingMiddleware, sample_rate=int(os.environ.get("PROFILING_SAMPLE_RATE") or 0))
+    app.include_router(profiling_router)
+
 
 @app.on_event("startup")
 async def startup_event():
     seed_items()
+    load_catalog()
     init_logging()
 
 
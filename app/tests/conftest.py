@@ -0,0 +1,112 @@
+"""
+Test database fixtures.
+
+Every pytest worker gets its own database, built once per session: a Postgres database migrated with
+Alembic when TEST_DATABASE_URL is set, otherwise a throwaway SQLite file created from the models.
+Each test runs inside a transaction that is rolled back afterwards, so tests never see each other's writes.
+
+DATABASE_URL must point at the test database before any app module creates its engine, hence the
+environment is set up at import time, ahead of the app imports below.
+"""
+import os
+import tempfile
+from contextlib import nullcontext
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+WORKER = os.environ.get("PYTEST_XDIST_WORKER", "main")
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+if TEST_DATABASE_URL:
+    base_url = make_url(TEST_DATABASE_URL)
+    os.environ["DATABASE_URL"] = base_url.set(database=f"{base_url.database}_{WORKER}").render_as_string(
+        hide_password=False
+    )
+else:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), f'test_{WORKER}.db')}"
+
+# Keep the admission control middleware from throttling the test client
+os.environ["RATE_LIMIT_PER_SECOND"] = "1000000"
+os.environ["RATE_LIMIT_BURST"] = "1000000"
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.core.db.seeder import seed_items
+from app.core.db.session import Base, engine, get_db, get_session_factory
+from app.main import app
+
+if engine.dialect.name == "sqlite":
+    # pysqlite manages transactions itself and breaks SAVEPOINT; let SQLAlchemy emit BEGIN instead
+
+    @event.listens_for(engine, "connect")
+    def disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def begin_sqlite_transaction(connection):
+        connection.exec_driver_sql("BEGIN")
+
+
+def create_worker_database() -> None:
+    """
+    Recreate this worker's Postgres database and migrate it to the latest revision.
+    """
+    from alembic import command
+    from alembic.config import Config
+
+    url = engine.url
+    admin_engine = create_engine(url.set(database="postgres"), isolation_level="AUTOCOMMIT")
+    with admin_engine.connect() as connection:
+        connection.exec_driver_sql(f'DROP DATABASE IF EXISTS "{url.database}"')
+        connection.exec_driver_sql(f'CREATE DATABASE "{url.database}"')
+    admin_engine.dispose()
+
+    config = Config(os.path.join(ROOT_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(ROOT_DIR, "alembic"))
+    command.upgrade(config, "head")
+
+
+@pytest.fixture(scope="session")
+def database():
+    if TEST_DATABASE_URL:
+        create_worker_database()
+    else:
+        Base.metadata.create_all(engine)
+    seed_items()
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(database):
+    """
+    A session whose commits only release savepoints of an outer transaction that is rolled back.
+    """
+    connection = database.connect()
+    transaction = connection.begin()
+    session = Session(bind=connection, join_transaction_mode="create_savepoint")
+    try:
+        yield session
+    finally:
+        session.close()
+        transaction.rollback()
+        connection.close()
+
+
+@pytest.fixture
+def client(db):
+    """
+    A test client whose requests all use the test's session, including the sessions reports open for
+    themselves, which must not close it. Startup events are not run.
+    """
+    app.dependency_overrides[get_db] = lambda: db
+    app.dependency_overrides[get_session_factory] = lambda: lambda: nullcontext(db)
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        app.dependency_overrides.pop(get_session_factory, None)
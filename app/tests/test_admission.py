@@ -0,0 +1,107 @@
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.admission import AdmissionControlMiddleware, ConcurrencyBudget, InMemoryRateLimitBackend
+from app.ecommerce.v1 import API_PREFIX, views
+from app.main import app as main_app
+
+
+def build_app(rate=1000, burst=1000):
+    app = FastAPI()
+    app.add_middleware(AdmissionControlMiddleware, rate=rate, burst=burst, api_keys={"dashboard"})
+    budget = ConcurrencyBudget(1)
+
+    @app.get("/cheap")
+    async def cheap():
+        return {"ok": True}
+
+    @app.get("/heavy")
+    async def heavy():
+        with budget:
+            await app.state.release.wait()
+        return {"ok": True}
+
+    return app
+
+
+def test_rate_limit_returns_429_with_retry_after():
+    client = TestClient(build_app(rate=0.5, burst=2))
+    assert client.get("/cheap").status_code == 200
+    assert client.get("/cheap").status_code == 200
+
+    response = client.get("/cheap")
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "2"
+
+    assert client.get("/cheap", headers={"X-API-Key": "made-up"}).status_code == 429
+    assert client.get("/cheap", headers={"X-API-Key": "dashboard"}).status_code == 200
+
+
+def test_concurrency_budget_fails_fast():
+    async def scenario():
+        app = build_app()
+        app.state.release = asyncio.Event()
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            first = asyncio.ensure_future(client.get("/heavy"))
+            await asyncio.sleep(0.05)
+            rejected = await client.get("/heavy")
+            cheap = await client.get("/cheap")
+            app.state.release.set()
+            return (await first).status_code, rejected, cheap.status_code
+
+    first, rejected, cheap = asyncio.run(scenario())
+    assert first == 200
+    assert rejected.status_code == 503
+    assert rejected.headers["retry-after"] == "1"
+    assert cheap == 200
+
+
+def test_backend_evicts_least_recent_clients():
+    backend = InMemoryRateLimitBackend(rate=1, burst=1, max_clients=2)
+    for key in ("a", "b", "c"):
+        assert backend.take(key) == 0
+    assert backend.take("c") > 0
+    assert backend.take("a") == 0
+
+
+def test_inventory_details_is_budgeted(client, monkeypatch):
+    def slow_inventory_details(db):
+        time.sleep(0.1)
+        return {"inventory": [], "low_stock_items": []}
+
+    monkeypatch.setattr(views, "query_inventory_details", slow_inventory_details)
+    monkeypatch.setitem(views.report_budgets, "inventory-details", ConcurrencyBudget(1))
+
+    async def scenario():
+        async with httpx.AsyncClient(app=main_app, base_url="http://test") as async_client:
+            return await asyncio.gather(*(async_client.get(f"{API_PREFIX}/inventory-details") for _ in range(12)))
+
+    statuses = sorted(response.status_code for response in asyncio.run(scenario()))
+    assert statuses == [200] + [503] * 11
+
+
+def test_identical_report_requests_share_the_budget(client, monkeypatch):
+    calls = []
+
+    def slow_sales_details(*args):
+        calls.append(args)
+        time.sleep(0.1)
+        return [{"product_id": 1, "total_quantity": 2, "total_sales": 20}]
+
+    monkeypatch.setattr(views, "query_sales_details", slow_sales_details)
+    monkeypatch.setitem(views.report_budgets, "sales-details", ConcurrencyBudget(1))
+
+    async def scenario():
+        async with httpx.AsyncClient(app=main_app, base_url="http://test") as async_client:
+            identical = [async_client.get(f"{API_PREFIX}/sales-details?product_id=1") for _ in range(12)]
+            other = async_client.get(f"{API_PREFIX}/sales-details?product_id=2")
+            return await asyncio.gather(*identical, other)
+
+    *identical, other = asyncio.run(scenario())
+    assert [response.status_code for response in identical] == [200] * 12
+    assert other.status_code == 503
+    assert len(calls) == 1
@@ -0,0 +1,37 @@
+from datetime import datetime
+
+from app.ecommerce.v1 import API_PREFIX
+from app.ecommerce.v1.archiver import archive_batch
+from app.ecommerce.v1.models import ArchivedOrder, ArchivedSalesDaily, Order, OrderItem
+
+
+def test_archived_orders_are_moved_and_still_reported(client, db):
+    order = Order(total_amount=21.98, status="delivered", customer_id=1, created_at=datetime(2020, 3, 1))
+    db.add(order)
+    db.flush()
+    order_id = order.id
+    db.add(OrderItem(order_id=order_id, product_id=1, quantity=2))
+    db.commit()
+
+    assert archive_batch(db, cutoff=datetime(2021, 1, 1)) == 1
+    db.commit()
+
+    assert db.query(Order).filter(Order.id == order_id).count() == 0
+    assert db.get(ArchivedOrder, order_id).order_items[0].quantity == 2
+    assert db.query(ArchivedSalesDaily).one().total_quantity == 2
+
+    archived_range = client.get(f"{API_PREFIX}/sales-details?start_date=2020-01-01&end_date=2020-12-31").json()
+    assert [(item["product_id"], item["total_quantity"]) for item in archived_range] == [(1, 2)]
+
+    everything = {item["product_id"]: item for item in client.get(f"{API_PREFIX}/sales-details").json()}
+    assert everything[1]["total_quantity"] == 4
+
+    recent_range = client.get(f"{API_PREFIX}/sales-details?start_date=2024-01-01&end_date=2030-12-31").json()
+    assert {item["product_id"]: item["total_quantity"] for item in recent_range} == {1: 2, 2: 1}
+
+    assert order_id not in {order["order_id"] for order in client.get(f"{API_PREFIX}/overview").json()}
+    overview = client.get(f"{API_PREFIX}/overview?include_archived=true").json()
+    archived = next(order for order in overview if order["order_id"] == order_id)
+    assert archived["archived"] is True
+    assert archived["customer"]["id"] == 1
+    assert archived["order_items"] == [{"product_id": 1, "product_name": "Product 1", "quantity": 2}]
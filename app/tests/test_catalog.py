@@ -0,0 +1,97 @@
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import insert
+
+from app.ecommerce.v1 import API_PREFIX, views
+from app.ecommerce.v1.catalog import CatalogIndex, catalog, product_exists, product_id_for_sku
+from app.ecommerce.v1.models import Product
+
+
+def build_index(count=100):
+    index = CatalogIndex()
+    for product_id in range(count, 0, -1):
+        index.upsert(product_id, f"SKU-{product_id}", Decimal("9.99") + product_id, product_id % 3 or None)
+    return index
+
+
+def test_lookup_by_id_sku_and_category():
+    index = build_index()
+    assert len(index) == 100
+    assert index.get(7) == (7, "SKU-7", Decimal("16.99"), 1)
+    assert index.get(9).category_id is None
+    assert index.id_for_sku("SKU-42") == 42
+    assert index.id_for_sku("missing") is None
+    assert index.ids_in_category(2) == tuple(range(2, 101, 3))
+
+
+def test_update_and_remove():
+    index = build_index()
+    index.upsert(7, "NEW-7", 5, 2)
+    assert index.id_for_sku("SKU-7") is None
+    assert index.id_for_sku("NEW-7") == 7
+    assert 7 in index.ids_in_category(2) and 7 not in index.ids_in_category(1)
+
+    for product_id in range(1, 90):
+        index.remove(product_id)
+    assert not index.contains(42)
+    assert index.id_for_sku("SKU-95") == 95
+    assert index.get(95).sku == "SKU-95"
+
+
+def test_memory_is_compact():
+    index = build_index(10000)
+    assert index.memory_usage() / len(index) < 128
+
+
+@pytest.fixture
+def loaded_catalog(db):
+    catalog.load(db)
+    try:
+        yield catalog
+    finally:
+        catalog.unload()
+
+
+def test_index_follows_committed_session_changes(loaded_catalog, db):
+    product = Product(name="Product 3", sku="SKU3", price=5, category_id=1)
+    db.add(product)
+    db.commit()
+    assert loaded_catalog.id_for_sku("SKU3") == product.id
+
+    # A rolled back savepoint must not discard the outer transaction's changes
+    product.price = 7
+    db.flush()
+    savepoint = db.begin_nested()
+    product.sku = "TEMP"
+    db.flush()
+    savepoint.rollback()
+    db.commit()
+    assert loaded_catalog.get(product.id) == (product.id, "SKU3", Decimal(7), 1)
+
+    product.price = 9
+    db.flush()
+    db.rollback()
+    assert loaded_catalog.get(product.id).price == 7
+
+    db.delete(product)
+    db.commit()
+    assert not loaded_catalog.contains(product.id)
+    assert loaded_catalog.id_for_sku("SKU3") is None
+
+
+def test_index_miss_falls_back_to_database(loaded_catalog, db):
+    product_id = db.execute(
+        insert(Product).values(name="Product 3", sku="SKU3", price=5, category_id=1).returning(Product.id)
+    ).scalar()
+
+    assert not loaded_catalog.contains(product_id)
+    assert product_exists(db, product_id)
+    assert product_id_for_sku(db, "SKU3") == product_id
+
+
+def test_sku_conflict_at_commit_is_a_conflict(client, monkeypatch):
+    monkeypatch.setattr(views, "product_id_for_sku", lambda db, sku: None)
+    payload = {"name": "Product 3", "sku": "SKU1", "price": 1, "category_id": 1}
+    assert client.post(f"{API_PREFIX}/products", json=payload).status_code == 409
+    assert client.put(f"{API_PREFIX}/products/2", json=payload).status_code == 409
@@ -0,0 +1,69 @@
+import gzip
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.core.compression import CompressionMiddleware, negotiate_encoding
+
+app = FastAPI()
+app.add_middleware(CompressionMiddleware, minimum_size=100, offload_size=1000)
+
+LARGE_BODY = "x" * 5000
+
+
+@app.get("/large")
+def large():
+    return PlainTextResponse(LARGE_BODY)
+
+
+@app.get("/small")
+def small():
+    return PlainTextResponse("ok")
+
+
+@app.get("/stream")
+def stream():
+    return StreamingResponse((LARGE_BODY for _ in range(3)), media_type="text/plain")
+
+
+@app.get("/events")
+def events():
+    return StreamingResponse(iter(["data: 1\n\n"] * 20), media_type="text/event-stream")
+
+
+client = TestClient(app)
+
+
+def test_negotiate_encoding():
+    encodings = {"zstd": None, "br": None, "gzip": None}
+    assert negotiate_encoding("gzip, br", encodings) == "br"
+    assert negotiate_encoding("gzip;q=1.0, br;q=0.5", encodings) == "gzip"
+    assert negotiate_encoding("*;q=0.1, zstd;q=0", encodings) == "br"
+    assert negotiate_encoding("identity", encodings) is None
+
+
+def test_large_response_is_compressed():
+    response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert int(response.headers["content-length"]) < len(LARGE_BODY)
+    assert response.text == LARGE_BODY
+
+
+def test_small_response_is_not_compressed():
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.text == "ok"
+
+
+def test_streaming_response_is_compressed_incrementally():
+    with client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        raw = b"".join(response.iter_raw())
+    assert gzip.decompress(raw).decode() == LARGE_BODY * 3
+
+
+def test_event_stream_is_not_compressed():
+    response = client.get("/events", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
@@ -1,23 +1,51 @@
-from fastapi.testclient import TestClient
-from app.main import app
+from app.ecommerce.v1 import API_PREFIX
+from app.ecommerce.v1.models import Category, Inventory
+from app.ecommerce.v1.views import inventory_events
 
-client = TestClient(app)
 
-
-def test_get_sales_details():
-    response = client.get("/sales-details")
+def test_get_sales_details(client):
+    response = client.get(f"{API_PREFIX}/sales-details")
     assert response.status_code == 200
 
-    response = client.get("/sales-details?start_date=2023-01-01&end_date=2023-12-31&product_id=1&category_id=2")
+    response = client.get(
+        f"{API_PREFIX}/sales-details?start_date=2023-01-01&end_date=2023-12-31&product_id=1&category_id=2"
+    )
     assert response.status_code == 200
     sales_data = response.json()
     assert isinstance(sales_data, list)
     assert all(isinstance(item, dict) for item in sales_data)
 
 
-def test_get_categories():
-    response = client.get("/categories")
+def test_get_categories(client):
+    response = client.get(f"{API_PREFIX}/categories")
     assert response.status_code == 200
     categories = response.json()
     assert isinstance(categories, list)
     assert all(isinstance(category, dict) for category in categories)
+
+
+def test_create_category(client, db):
+    response = client.post(f"{API_PREFIX}/categories", json={"name": "Category 3"})
+    assert response.status_code == 201
+    assert db.query(Category).filter(Category.name == "Category 3").count() == 1
+
+
+def test_writes_are_rolled_back_between_tests(db):
+    assert db.query(Category).filter(Category.name == "Category 3").count() == 0
+
+
+def test_create_product_rejects_duplicate_sku(client):
+    payload = {"name": "Product 3", "sku": "SKU1", "price": 1, "category_id": 1}
+    response = client.post(f"{API_PREFIX}/products", json=payload)
+    assert response.status_code == 409
+
+
+def test_update_inventory_publishes_low_stock(client, db):
+    last_event_id = str(inventory_events.publish("test", {}))
+
+    response = client.put(f"{API_PREFIX}/update-inventory/1?quantity_change=-95")
+    assert response.status_code == 200
+    assert db.query(Inventory.remaining_quantity).filter(Inventory.product_id == 1).scalar() == 5
+
+    events = [message.split("\n")[1] for message in inventory_events.replay(last_event_id)]
+    assert events == ["event: inventory_change", "event: low_stock"]
@@ -0,0 +1,46 @@
+import asyncio
+
+from app.core.events import EventBroker
+
+
+async def read_events(broker, count, last_event_id=None):
+    stream = broker.stream(last_event_id)
+    messages = [await stream.__anext__() for _ in range(count)]
+    await stream.aclose()
+    return messages
+
+
+def test_publish_reaches_subscriber():
+    async def scenario():
+        broker = EventBroker()
+        reader = asyncio.ensure_future(read_events(broker, 2))
+        await asyncio.sleep(0)
+        broker.publish("low_stock", {"product_id": 1})
+        return await reader
+
+    retry, message = asyncio.run(scenario())
+    assert retry.startswith("retry:")
+    assert message == 'id: 1\nevent: low_stock\ndata: {"product_id":1}\n\n'
+
+
+def test_resume_from_last_event_id():
+    broker = EventBroker()
+    for product_id in range(1, 4):
+        broker.publish("inventory_change", {"product_id": product_id})
+
+    messages = asyncio.run(read_events(broker, 3, last_event_id="1"))
+    assert [message.split("\n")[0] for message in messages[1:]] == ["id: 2", "id: 3"]
+
+
+def test_slow_subscriber_is_dropped():
+    async def scenario():
+        broker = EventBroker(queue_size=1)
+        stream = broker.stream()
+        await stream.__anext__()
+        broker.publish("inventory_change", {"product_id": 1})
+        broker.publish("inventory_change", {"product_id": 2})
+        assert broker.subscriber_count == 0
+        remaining = [message async for message in stream]
+        return remaining
+
+    assert asyncio.run(scenario()) == []
@@ -0,0 +1,161 @@
+import json
+from datetime import datetime, timedelta, timezone
+from functools import partial
+
+import anyio
+from sqlalchemy import update
+
+from app.ecommerce.v1 import API_PREFIX, views
+from app.ecommerce.v1.catalog import catalog
+from app.ecommerce.v1.importer import chunk_rows, claim_job, create_job, import_chunk, read_rows, run_import
+from app.ecommerce.v1.models import Customer, ImportJob, Inventory, InventoryChangeHistory, Order, Product
+from app.ecommerce.v1.views import inventory_events
+
+
+def test_read_rows_ndjson_reports_bad_lines():
+    lines = ['{"sku": "SKU1"}\n', "\n", "not json\n", "[1, 2]\n"]
+    rows = list(read_rows(lines, "ndjson"))
+    assert rows[0] == (1, {"sku": "SKU1"}, None)
+    assert rows[1][0] == 2 and rows[1][2].startswith("invalid JSON")
+    assert rows[2] == (3, None, "expected a JSON object")
+
+
+def test_read_rows_csv_drops_empty_cells():
+    lines = ["sku,quantity,created_at\n", "SKU1,2,\n"]
+    assert list(read_rows(lines, "csv")) == [(1, {"sku": "SKU1", "quantity": "2"}, None)]
+
+
+def test_chunk_rows_keeps_orders_together():
+    refs = ["A", "A", "B", "B", "B", None, None]
+    rows = [(number, {"order_ref": ref}, None) for number, ref in enumerate(refs, 1)]
+    chunks = [[row[1]["order_ref"] for row in chunk] for chunk in chunk_rows(rows, chunk_size=1)]
+    assert chunks == [["A", "A"], ["B", "B", "B"], [None], [None]]
+
+
+def test_claim_job_is_exclusive(db):
+    job = create_job(db, "orders.ndjson", "ndjson")
+    assert claim_job(db, job.id)
+    assert not claim_job(db, job.id)
+    assert not claim_job(db, job.id, force=True)
+
+    db.execute(update(ImportJob).where(ImportJob.id == job.id).values(
+        updated_at=datetime.now(timezone.utc) - timedelta(hours=1)
+    ))
+    db.commit()
+    assert claim_job(db, job.id, force=True)
+
+
+def test_resume_refuses_jobs_it_cannot_claim(client, db):
+    job = create_job(db, "orders.ndjson", "ndjson")
+    claim_job(db, job.id)
+
+    response = client.post(f"{API_PREFIX}/orders/import/{job.id}/resume")
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Import job is running"
+    assert client.post(f"{API_PREFIX}/orders/import/{job.id}/resume?force=true").status_code == 409
+    assert client.post(f"{API_PREFIX}/orders/import/0/resume").status_code == 404
+
+
+def test_import_endpoint_spools_body_and_claims_job(client, monkeypatch, tmp_path):
+    started = []
+    monkeypatch.setattr(views, "IMPORT_DIR", str(tmp_path))
+    monkeypatch.setattr(views, "run_import", lambda job_id, **kwargs: started.append(job_id))
+    body = b'{"sku": "SKU1", "quantity": 1}\n' * 1000
+
+    response = client.post(f"{API_PREFIX}/orders/import", content=body)
+
+    assert response.status_code == 202
+    job = response.json()
+    assert job["status"] == "running"
+    assert started == [job["id"]]
+    with open(job["source"], "rb") as spool:
+        assert spool.read() == body
+
+
+def test_import_chunk_rejects_orders_with_invalid_lines(db):
+    customer = {"name": "New", "email": "new@example.com", "phone": "555"}
+    rows = [
+        (1, {**customer, "order_ref": "A", "sku": "SKU1", "quantity": 1}, None),
+        (2, {**customer, "order_ref": "A", "sku": "NOPE", "quantity": 1}, None),
+        (3, {**customer, "order_ref": "A", "sku": "SKU2", "quantity": 0}, None),
+        (4, {**customer, "order_ref": "B", "sku": "SKU2", "quantity": 1}, None),
+    ]
+    orders_before = db.query(Order).count()
+
+    orders_created, items_created, errors, _ = import_chunk(db, rows)
+
+    assert (orders_created, items_created) == (1, 1)
+    assert sorted(error["row"] for error in errors) == [1, 2, 3]
+    assert {"row": 1, "error": "order_ref: another line of the order is invalid"} in errors
+    assert db.query(Order).count() == orders_before + 1
+
+
+def test_import_prices_orders_from_the_database(db):
+    catalog.load(db)
+    try:
+        db.execute(update(Product).where(Product.id == 1).values(price=20))
+        rows = [(1, {"name": "New", "email": "new@example.com", "phone": "555", "sku": "SKU1", "quantity": 2}, None)]
+        assert import_chunk(db, rows)[0] == 1
+    finally:
+        catalog.unload()
+
+    assert db.query(Order.total_amount).order_by(Order.id.desc()).limit(1).scalar() == 40
+
+
+def test_import_chunk(db):
+    rows = [
+        (1, {"order_ref": "A", "name": "New", "email": "new@example.com", "phone": "555", "sku": "SKU1",
+             "quantity": 3}, None),
+        (2, {"order_ref": "A", "name": "New", "email": "new@example.com", "phone": "555", "sku": "SKU2",
+             "quantity": 1}, None),
+        (3, {"name": "Customer 1", "email": "customer1@example.com", "phone": "1234567890", "sku": "SKU1",
+             "quantity": 2}, None),
+        (4, {"name": "Unknown", "email": "x@example.com", "phone": "1", "sku": "NOPE", "quantity": 1}, None),
+        (5, None, "invalid JSON"),
+    ]
+    orders_before = db.query(Order).count()
+
+    orders_created, items_created, errors, inventory_changes = import_chunk(db, rows)
+
+    assert (orders_created, items_created) == (2, 3)
+    assert [error["row"] for error in errors] == [5, 4]
+    assert db.query(Order).count() == orders_before + 2
+    assert db.query(Customer).filter(Customer.email == "new@example.com").count() == 1
+    assert db.query(Inventory.remaining_quantity).filter(Inventory.product_id == 1).scalar() == 95
+    assert db.query(InventoryChangeHistory).filter(InventoryChangeHistory.quantity_change == -5).count() == 1
+    assert {change["product_id"]: change["new_quantity"] for change in inventory_changes} == {1: 95, 2: 199}
+
+
+def test_import_chunk_rejects_orders_without_stock(db):
+    customer = {"name": "New", "email": "new@example.com", "phone": "555"}
+    rows = [
+        (1, {**customer, "order_ref": "A", "sku": "SKU1", "quantity": 60}, None),
+        (2, {**customer, "order_ref": "B", "sku": "SKU1", "quantity": 60}, None),
+        (3, {**customer, "order_ref": "B", "sku": "SKU2", "quantity": 1}, None),
+    ]
+
+    orders_created, items_created, errors, inventory_changes = import_chunk(db, rows)
+
+    assert (orders_created, items_created) == (1, 1)
+    assert [error["row"] for error in errors] == [2, 3]
+    assert errors[0]["error"] == "quantity: insufficient inventory for SKU 'SKU1'"
+    assert db.query(Inventory.remaining_quantity).filter(Inventory.product_id == 1).scalar() == 40
+    assert db.query(Inventory.remaining_quantity).filter(Inventory.product_id == 2).scalar() == 200
+
+
+def test_background_import_publishes_inventory_events(db, tmp_path):
+    source = tmp_path / "orders.ndjson"
+    source.write_text(json.dumps(
+        {"name": "New", "email": "new@example.com", "phone": "555", "sku": "SKU1", "quantity": 95}
+    ))
+    job = create_job(db, str(source), "ndjson")
+    claim_job(db, job.id)
+    last_event_id = str(inventory_events.publish("test", {}))
+
+    anyio.run(anyio.to_thread.run_sync, partial(
+        run_import, job.id, session_factory=lambda: db, on_progress=views.import_progress
+    ))
+
+    assert db.get(ImportJob, job.id).status == "completed"
+    events = [message.split("\n")[1] for message in inventory_events.replay(last_event_id)]
+    assert events == ["event: inventory_change", "event: low_stock"]
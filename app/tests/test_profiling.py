@@ -0,0 +1,131 @@
+import asyncio
+import marshal
+import threading
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.core.profiling import ProfilingMiddleware, ProfileStore, profile_store, profiling_router, sample_stacks
+
+ADMIN = {"X-Admin-Token": "secret"}
+
+
+@pytest.fixture
+def profiled_client(monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware, store=profile_store)
+    app.include_router(profiling_router)
+
+    @app.get("/work")
+    def work():
+        return {"total": sum(range(1000))}
+
+    def heavy_query():
+        time.sleep(0.05)
+        return 42
+
+    @app.get("/report")
+    async def report():
+        return {"total": await run_in_threadpool(heavy_query)}
+
+    return TestClient(app)
+
+
+def test_admin_routes_require_token(profiled_client):
+    assert profiled_client.get("/admin/profiles").status_code == 403
+    assert profiled_client.get("/admin/profiles", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+
+def test_profile_requested_by_header(profiled_client):
+    assert "x-profile-id" not in profiled_client.get("/work", headers={"X-Profile": "1"}).headers
+
+    response = profiled_client.get("/work", headers={"X-Profile": "1", **ADMIN})
+    profile_id = response.headers["x-profile-id"]
+
+    report = profiled_client.get(f"/admin/profiles/{profile_id}", headers=ADMIN)
+    assert "function calls" in report.text
+
+    raw = profiled_client.get(f"/admin/profiles/{profile_id}?format=pstats", headers=ADMIN)
+    assert isinstance(marshal.loads(raw.content), dict)
+
+
+def test_threadpool_work_is_sampled(profiled_client):
+    response = profiled_client.get("/report", headers={"X-Profile": "1", **ADMIN})
+    profile_id = response.headers["x-profile-id"]
+
+    stacks = profiled_client.get(f"/admin/profiles/{profile_id}?format=collapsed", headers=ADMIN).text
+    assert ";heavy_query (test_profiling.py:" in stacks
+
+
+def test_event_streams_stop_profiling_when_they_start(monkeypatch):
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    store = ProfileStore()
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware, store=store)
+    app.get("/ping")(lambda: "pong")
+
+    @app.get("/events")
+    async def events():
+        async def stream():
+            yield "data: first\n\n"
+            await app.state.release.wait()
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    async def scenario():
+        app.state.release = asyncio.Event()
+        async with httpx.AsyncClient(app=app, base_url="http://test") as async_client:
+            stream = asyncio.ensure_future(async_client.get("/events", headers={"X-Profile": "1", **ADMIN}))
+            await asyncio.sleep(0.05)
+            ping = await async_client.get("/ping", headers={"X-Profile": "1", **ADMIN})
+            app.state.release.set()
+            return (await stream).headers["x-profile-id"], ping.headers.get("x-profile-id")
+
+    stream_profile_id, ping_profile_id = asyncio.run(scenario())
+    assert ping_profile_id is not None
+    assert store.get(int(stream_profile_id))["summary"]["ended"] == "stream"
+
+
+def test_one_in_n_requests_is_sampled():
+    store = ProfileStore()
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware, sample_rate=3, store=store)
+    app.get("/ping")(lambda: "pong")
+    client = TestClient(app)
+
+    for _ in range(6):
+        client.get("/ping")
+    assert [summary["sampled"] for summary in store.summaries()] == [True, True]
+
+
+def test_sample_stacks_returns_collapsed_format():
+    stop = threading.Event()
+
+    def busy_worker():
+        while not stop.is_set():
+            sum(range(1000))
+
+    def idle_worker():
+        stop.wait()
+
+    workers = [threading.Thread(target=busy_worker), threading.Thread(target=idle_worker)]
+    for worker in workers:
+        worker.start()
+    try:
+        lines = sample_stacks(0.05).splitlines()
+        with_idle = sample_stacks(0.05, include_idle=True)
+    finally:
+        stop.set()
+        for worker in workers:
+            worker.join()
+
+    stacks = dict(line.rsplit(" ", 1) for line in lines)
+    assert any(";busy_worker (test_profiling.py:" in stack for stack in stacks)
+    assert not any("idle_worker" in stack for stack in stacks)
+    assert all(int(count) > 0 for count in stacks.values())
+    assert ";idle_worker (test_profiling.py:" in with_idle
@@ -0,0 +1,108 @@
+import asyncio
+from contextlib import contextmanager
+
+import pytest
+
+from app.core.db.session import get_session_factory
+from app.core.singleflight import SingleFlight
+from app.ecommerce.v1 import API_PREFIX
+from app.ecommerce.v1.views import reporting_flight
+from app.main import app
+
+
+def test_concurrent_calls_share_one_computation():
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"total": 42}
+
+    async def scenario():
+        flight = SingleFlight()
+        return await asyncio.gather(*(flight.do("sales", compute) for _ in range(10)))
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+
+
+def test_result_reused_within_ttl():
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return len(calls)
+
+    async def scenario(ttl):
+        flight = SingleFlight(ttl=ttl)
+        return [await flight.do("sales", compute), await flight.do("sales", compute)]
+
+    assert asyncio.run(scenario(ttl=60)) == [1, 1]
+    calls.clear()
+    assert asyncio.run(scenario(ttl=0)) == [1, 2]
+
+
+def test_failures_are_not_cached():
+    async def fail():
+        raise ValueError("boom")
+
+    async def succeed():
+        return "ok"
+
+    async def scenario():
+        flight = SingleFlight(ttl=60)
+        with pytest.raises(ValueError):
+            await flight.do("sales", fail)
+        return await flight.do("sales", succeed)
+
+    assert asyncio.run(scenario()) == "ok"
+
+
+def test_forget_drops_cached_and_in_flight_results():
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    async def scenario():
+        flight = SingleFlight(ttl=60)
+        first = await flight.do("sales", compute)
+        flight.forget()
+        in_flight = asyncio.ensure_future(flight.do("sales", compute))
+        await asyncio.sleep(0)
+        flight.forget()
+        return [first, await in_flight, await flight.do("sales", compute)]
+
+    assert asyncio.run(scenario()) == [1, 2, 3]
+
+
+def test_writes_invalidate_cached_reports(client, monkeypatch):
+    monkeypatch.setattr(reporting_flight, "ttl", 60)
+    reporting_flight.forget()
+
+    def product_names():
+        overview = client.get(f"{API_PREFIX}/overview").json()
+        return {item["product_name"] for order in overview for item in order["order_items"]}
+
+    assert "Renamed" not in product_names()
+    payload = {"name": "Renamed", "sku": "SKU1", "price": 10, "category_id": 1}
+    assert client.put(f"{API_PREFIX}/products/1", json=payload).status_code == 200
+    assert "Renamed" in product_names()
+
+
+def test_reports_open_their_own_session(client, db):
+    sessions = []
+
+    @contextmanager
+    def report_session():
+        sessions.append("opened")
+        yield db
+        sessions.append("closed")
+
+    app.dependency_overrides[get_session_factory] = lambda: report_session
+    assert client.get(f"{API_PREFIX}/overview").status_code == 200
+    assert client.get(f"{API_PREFIX}/sales-details").status_code == 200
+    assert sessions == ["opened", "closed"] * 2
@@ -0,0 +1,26 @@
+import json
+
+from app.core.streaming import iter_json_array, iter_json_object
+from app.ecommerce.v1 import API_PREFIX
+
+
+def test_json_is_streamed_in_batches():
+    items = [{"id": number, "name": f"Item {number}"} for number in range(5)]
+    chunks = list(iter_json_array(items, batch_size=2))
+    assert len(chunks) == 5
+    assert json.loads(b"".join(chunks)) == items
+
+    assert json.loads(b"".join(iter_json_array([]))) == []
+    document = {"inventory": items, "low_stock_items": [], "total": 5}
+    assert json.loads(b"".join(iter_json_object(document, batch_size=2))) == document
+
+
+def test_large_reports_are_chunked(client):
+    for route in ("/overview", "/inventory-details"):
+        response = client.get(f"{API_PREFIX}{route}", headers={"Accept-Encoding": "identity"})
+        assert response.status_code == 200
+        assert "content-length" not in response.headers
+        assert response.headers["content-type"] == "application/json"
+
+    inventory = client.get(f"{API_PREFIX}/inventory-details").json()
+    assert {item["product_id"] for item in inventory["inventory"]} == {1, 2}